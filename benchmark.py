@@ -0,0 +1,170 @@
+"""
+Benchmarks of the wardrobe build stages.
+Run from the repository directory:
+    python benchmark.py > bench_output.txt
+Machined parts of every variant are compared by their fingerprints against 'fingerprints.json',
+    python benchmark.py --update-reference
+writes the reference from the current build.
+"""
+import sys
+import time
+from pathlib import Path
+from contextlib import contextmanager
+
+import build_log
+import fingerprint
+import freecad
+import FreeCAD
+import Part
+import tool_shapes as ts
+
+script_dir = Path(__file__).parent
+
+
+@contextmanager
+def timer(label, results: dict = None):
+    t_start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - t_start
+    if results is not None:
+        results[label] = elapsed
+    print(f"{label:40} {elapsed:10.3f} s")
+
+
+@contextmanager
+def placement_transforms(enabled: bool):
+    orig = freecad.placement_transforms
+    freecad.placement_transforms = enabled
+    try:
+        yield
+    finally:
+        freecad.placement_transforms = orig
+
+
+def make_wardrobe():
+    import main_cad
+    return main_cad.Wardrobe(script_dir)
+
+
+def cut_all(placed_parts, tools=None):
+    return [p.apply_machine_ops(tools=tools)[0] for p in placed_parts]
+
+
+def check_geometry(label, placed_parts, shapes, reference):
+    """
+    Compare fingerprints of the machined parts with the reference, print differences.
+    """
+    current = fingerprint.fingerprints(placed_parts, shapes)
+    if reference is None:
+        return current
+    diffs = fingerprint.compare(reference, current)
+    status = "OK" if not diffs else f"{len(diffs)} DIFFERENCES"
+    print(f"    geometry {label}: {status}")
+    for d in diffs:
+        print(f"        {d}")
+    return current
+
+
+def bench_transforms(n=1000):
+    """
+    Transform of a single tool shape, geometry rebuild vs. location change.
+    """
+    shape = ts.make_cylinder(4, 30)
+    transform = ts.rotate([0, 0, 1], [1, 0, 0]) @ ts.translate([10, 20, 30])
+    results = {}
+    for enabled in [False, True]:
+        with placement_transforms(enabled), timer(f"transform x{n}, placement={enabled}", results):
+            for i in range(n):
+                shape @ transform
+    return results
+
+
+def bench_mill_tools(n=20):
+    """
+    Canonical mill tool solid: lofted fuse vs. analytic slot, uncached and cached.
+    """
+    from machine import lofted_mill_tool_shape, slot_tool_shape, canonical_tool
+    params = [(22.0, 1.0, 600.0), (3.75, 10.5, 7.5), (3.75, 8.0, 2000.0)]
+    results = {}
+    with timer(f"mill tool x{n}, lofted", results):
+        for i in range(n):
+            for p in params:
+                lofted_mill_tool_shape(*p, 0)
+    with timer(f"mill tool x{n}, analytic", results):
+        for i in range(n):
+            for p in params:
+                slot_tool_shape(*p)
+    with timer(f"mill tool x{n}, cached", results):
+        for i in range(n):
+            for p in params:
+                canonical_tool(('mill', *p, 0.0))
+    for p in params:
+        lofted, slot = lofted_mill_tool_shape(*p, 0), slot_tool_shape(*p)
+        print(f"    volume {p}: lofted {lofted.Volume:.3f}, analytic {slot.Volume:.3f}")
+    return results
+
+
+def bench_build(reference=None):
+    """
+    Wardrobe assembly and cutting of all parts, no export.
+    :param reference: fingerprints to compare the machined parts with
+    :return: timings, fingerprints of the last variant
+    """
+    results = {}
+    current = None
+    for enabled in [False, True]:
+        with placement_transforms(enabled):
+            with timer(f"assembly, placement={enabled}", results):
+                w = make_wardrobe()
+            with timer(f"cutting, placement={enabled}", results):
+                shapes = cut_all(w.placed_objects)
+            current = check_geometry(f"placement={enabled}", w.placed_objects, shapes, reference)
+            # without reference the variants are compared to the first one
+            reference = current if reference is None else reference
+    return results, current
+
+
+def bench_tool_pool(reference=None):
+    """
+    Cutting with the tools built lazily in the cutting thread vs. precomputed in a process pool.
+    """
+    import machine
+    import tool_pool
+    results = {}
+    w = make_wardrobe()
+    machine.clear_tool_cache()
+    with timer("cutting, lazy tools", results):
+        cut_all(w.placed_objects)
+    w = make_wardrobe()
+    machine.clear_tool_cache()
+    with timer("cutting, tool pool", results):
+        with tool_pool.ToolPrecompute.start(w.placed_objects) as pool:
+            shapes = cut_all(w.placed_objects, tools=pool.get)
+    check_geometry("tool pool", w.placed_objects, shapes, reference)
+    return results
+
+
+def speedup(results, label):
+    before = results[f"{label}, placement=False"]
+    after = results[f"{label}, placement=True"]
+    print(f"{label:40} speedup {before / after:6.2f}x")
+
+
+if __name__ == "__main__":
+    build_log.configure(quiet=True)
+    res = bench_transforms()
+    speedup(res, "transform x1000")
+    res = bench_mill_tools()
+    for variant in ["analytic", "cached"]:
+        print(f"mill tool {variant:30} speedup {res['mill tool x20, lofted'] / res[f'mill tool x20, {variant}']:6.2f}x")
+    reference_path = script_dir / "fingerprints.json"
+    update = "--update-reference" in sys.argv or not reference_path.exists()
+    reference = None if update else fingerprint.load(reference_path)
+    res, current = bench_build(reference)
+    if update:
+        fingerprint.save(current, reference_path)
+        reference = current
+    speedup(res, "assembly")
+    speedup(res, "cutting")
+    res = bench_tool_pool(reference)
+    print(f"{'tool pool':40} speedup {res['cutting, lazy tools'] / res['cutting, tool pool']:6.2f}x")
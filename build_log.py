@@ -0,0 +1,107 @@
+"""
+Structured logging of the wardrobe build.
+
+Thin layer over the standard `logging` package:
+- all loggers are children of the "masif" logger, `get_logger(__name__)` in the modules
+- pass the message arguments separately, `log.debug("apply %r", op)`,
+  so the `repr` is only computed if the level is enabled
+- `event(log, name, **fields)` named event with machine-readable fields
+- `Progress` per-part counter, logs every n-th step and a summary event
+- `configure(level, quiet, json_path)` console output and an optional JSON lines event stream
+
+Usage:
+    build_log.configure(quiet=True, json_path="build_events.jsonl")
+"""
+from typing import *
+import json
+import logging
+import sys
+import time
+
+ROOT = "masif"
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def event(logger: logging.Logger, name: str, level: int = logging.INFO, **fields):
+    """
+    Log named event, fields are written as separate keys to the JSON stream.
+    """
+    if logger.isEnabledFor(level):
+        text = " ".join(f"{k}={v}" for k, v in fields.items())
+        logger.log(level, "%s %s", name, text, extra=dict(event=name, fields=fields))
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        data = dict(time=record.created, level=record.levelname, logger=record.name)
+        name = getattr(record, "event", None)
+        if name is None:
+            data["message"] = record.getMessage()
+        else:
+            data["event"] = name
+            data.update(getattr(record, "fields", {}))
+        return json.dumps(data, default=str)
+
+
+class Progress:
+    """
+    Counter of processed items (parts), logs at INFO every 'every' items,
+    every single item as the '<name>_step' event at DEBUG and the 'name' event with the total time at the end.
+    Usage:
+        progress = Progress(log, "cut", total=len(parts))
+        for p in parts:
+            progress.step(p.name)
+        progress.done()
+    """
+    def __init__(self, logger: logging.Logger, name: str, total: int = None, every: int = 10):
+        self.logger = logger
+        self.name = name
+        self.total = total
+        self.every = every
+        self.count = 0
+        self.t_start = time.perf_counter()
+
+    def step(self, item: str = ""):
+        self.count += 1
+        event(self.logger, f"{self.name}_step", logging.DEBUG, count=self.count, total=self.total, item=item)
+        if self.count % self.every == 0:
+            self.logger.info("%s %d/%s, %.2f s", self.name, self.count, self.total, self.elapsed)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t_start
+
+    def done(self, **fields):
+        event(self.logger, self.name, count=self.count, elapsed=round(self.elapsed, 3), **fields)
+
+
+def configure(level: Union[int, str] = logging.INFO, quiet: bool = False, json_path=None):
+    """
+    Set up the console handler and optionally the JSON event stream, replaces previous configuration.
+    :param level: console level
+    :param quiet: console shows only warnings and errors
+    :param json_path: file for the JSON lines stream, gets all records of the 'level' and above
+    """
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+    logger = logging.getLogger(ROOT)
+    for h in list(logger.handlers):
+        logger.removeHandler(h)
+        h.close()
+    logger.setLevel(level)
+    logger.propagate = False
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.WARNING if quiet else level)
+    console.setFormatter(logging.Formatter("%(levelname)-8s%(name)s: %(message)s"))
+    logger.addHandler(console)
+    if json_path is not None:
+        stream = logging.FileHandler(json_path, mode="w")
+        stream.setFormatter(JsonFormatter())
+        logger.addHandler(stream)
+    return logger
@@ -0,0 +1,213 @@
+"""
+Local build service keeping FreeCAD, the tool caches and the parsed parts tables warm.
+
+The server listens on a Unix socket, every connection submits a single build job
+as one JSON line and gets back a stream of JSON lines: 'queued', the build events
+(per-part '*_step' progress, 'preflight', 'export', ...) and finally 'done' with the output files
+or 'failed'. Jobs are built one by one in a single worker thread, in order of arrival.
+
+    python build_service.py serve
+    python build_service.py submit --cuts --out-dir /tmp/w1
+
+Request:
+    {"workdir": "...", "out_dir": "...", "options": {"cuts": true, "step": false}}
+options are the `main_cad.BuildOptions` fields.
+"""
+from typing import *
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import attrs
+
+import build_log
+import export_writer
+import main_cad
+
+log = build_log.get_logger(__name__)
+
+SOCKET = Path(tempfile.gettempdir()) / "masif_build.sock"
+# build contexts kept warm (parsed parts tables), least recently used are dropped
+MAX_CONTEXTS = 8
+
+
+class JobEvents(logging.Handler):
+    """
+    Forward the build events from the worker thread to the job event queue.
+    """
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        super().__init__(logging.DEBUG)
+        self.loop = loop
+        self.queue = queue
+
+    def emit(self, record: logging.LogRecord):
+        name = getattr(record, "event", None)
+        if name is not None:
+            msg = dict(event=name, **getattr(record, "fields", {}))
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, msg)
+
+
+@attrs.define
+class Job:
+    id: int
+    workdir: Path
+    out_dir: Path
+    options: main_cad.BuildOptions
+    events: asyncio.Queue
+
+
+class BuildService:
+    def __init__(self):
+        self.jobs: asyncio.Queue = asyncio.Queue()
+        # FreeCAD documents are used from a single thread
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="build")
+        self.contexts: collections.OrderedDict[Tuple[Path, Path], main_cad.BuildContext] = collections.OrderedDict()
+        # single STEP writer process of all contexts, started by the first build
+        self.writer: Optional[export_writer.ExportWriter] = None
+        self._ids = itertools.count(1)
+
+    def build(self, job: Job) -> main_cad.BuildResult:
+        """
+        Run the job in the worker thread. The document is closed after the build,
+        the geometry is saved in the output files and is not kept by the service.
+        """
+        if self.writer is None:
+            self.writer = export_writer.ExportWriter()
+        key = (job.workdir, job.out_dir)
+        ctx = self.contexts.pop(key, None)
+        if ctx is None:
+            ctx = main_cad.BuildContext(job.workdir, job.out_dir, writer=self.writer)
+        self.contexts[key] = ctx
+        while len(self.contexts) > MAX_CONTEXTS:
+            self.contexts.popitem(last=False)[1].close()
+        try:
+            return ctx.run(job.options)
+        finally:
+            ctx.close()
+
+    async def worker(self):
+        loop = asyncio.get_running_loop()
+        logger = logging.getLogger(build_log.ROOT)
+        while True:
+            job = await self.jobs.get()
+            handler = JobEvents(loop, job.events)
+            logger.addHandler(handler)
+            try:
+                result = await loop.run_in_executor(self.executor, self.build, job)
+                if result.ok:
+                    job.events.put_nowait(dict(event="done", job=job.id, files=[str(f) for f in result.files],
+                                               warnings=len(result.problems), elapsed=round(result.elapsed, 3)))
+                else:
+                    job.events.put_nowait(dict(event="failed", job=job.id, error="Pre-flight validation failed.",
+                                               problems=[str(p) for p in result.problems]))
+            except Exception as e:
+                log.exception("job %d failed", job.id)
+                job.events.put_nowait(dict(event="failed", job=job.id, error=f"{type(e).__name__}: {e}"))
+            finally:
+                logger.removeHandler(handler)
+                job.events.put_nowait(None)
+
+    def make_job(self, request: Dict[str, Any]) -> Job:
+        workdir = Path(request.get("workdir", main_cad.script_dir))
+        out_dir = Path(request.get("out_dir", workdir))
+        options = main_cad.BuildOptions(**request.get("options", {}))
+        return Job(next(self._ids), workdir, out_dir, options, asyncio.Queue())
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        async def send(msg):
+            writer.write((json.dumps(msg, default=str) + "\n").encode())
+            await writer.drain()
+
+        try:
+            try:
+                job = self.make_job(json.loads(await reader.readline()))
+            except (ValueError, TypeError) as e:
+                await send(dict(event="failed", error=f"Invalid request: {e}"))
+                return
+            await send(dict(event="queued", job=job.id, position=self.jobs.qsize()))
+            await self.jobs.put(job)
+            while True:
+                msg = await job.events.get()
+                if msg is None:
+                    break
+                await send(msg)
+        except ConnectionError:
+            log.warning("client disconnected")
+        finally:
+            writer.close()
+
+    async def serve(self, path: Path = SOCKET):
+        path = Path(path)
+        if path.exists():
+            path.unlink()
+        server = await asyncio.start_unix_server(self.handle, path=str(path))
+        # per-part progress events are DEBUG records, the handlers filter the console output
+        logging.getLogger(build_log.ROOT).setLevel(logging.DEBUG)
+        log.info("build service at %s", path)
+        worker = asyncio.create_task(self.worker())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+            self.executor.shutdown(wait=True)
+            for ctx in self.contexts.values():
+                ctx.close()
+            if self.writer is not None:
+                self.writer.close(cancel=True)
+
+
+async def submit(request: Dict[str, Any], path: Path = SOCKET) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Submit the job, yield its events until 'done' or 'failed'.
+    """
+    reader, writer = await asyncio.open_unix_connection(str(path))
+    try:
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            yield json.loads(line)
+    finally:
+        writer.close()
+
+
+async def print_events(request: Dict[str, Any], path: Path) -> bool:
+    ok = False
+    async for msg in submit(request, path):
+        print(json.dumps(msg))
+        ok = msg["event"] == "done"
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["serve", "submit"])
+    parser.add_argument("--socket", type=Path, default=SOCKET)
+    parser.add_argument("--workdir", type=Path, default=main_cad.script_dir)
+    parser.add_argument("--out-dir", type=Path, default=None)
+    parser.add_argument("--cuts", action="store_true")
+    parser.add_argument("--no-step", action="store_true", help="skip the STEP and FreeCAD output")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args()
+    if args.command == "serve":
+        build_log.configure(quiet=args.quiet)
+        asyncio.run(BuildService().serve(args.socket))
+    else:
+        request = dict(workdir=str(args.workdir.resolve()),
+                       options=dict(cuts=args.cuts, step=not args.no_step))
+        if args.out_dir is not None:
+            request["out_dir"] = str(args.out_dir.resolve())
+        if not asyncio.run(print_events(request, args.socket)):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Background writer of the STEP files.
+
+The cut loop of `build_from_placed` hands finished shapes to the writer process and continues
+with the next part. FreeCAD keeps the GIL during the STEP export, so the export runs in a separate
+process, the shapes are passed as BREP strings (as in `tool_pool`). The main process only serializes
+the shape, no document objects are touched outside of the main thread.
+
+A single worker process writes the files in order of submission and keeps the named shapes
+for the assembly files (`write_assembly`). At most 'max_pending' shapes wait for the worker
+(back-pressure: `write` blocks if the writer falls behind). `flush` waits for all files,
+re-raises the first write error and logs the write throughput.
+A writer can serve many builds (the worker process imports FreeCAD just once), `clear`
+between the builds drops the named shapes, so every build has its own assembly namespace.
+
+Usage:
+    with ExportWriter(max_pending=4) as writer:
+        for p in placed_parts:
+            obj, cuts = p.make_obj(doc)
+            writer.write(obj.Shape, f"{p.name}.step", name=p.name)
+        writer.write_assembly([p.name for p in placed_parts], "assembly.step")
+"""
+from typing import *
+import collections
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from pathlib import Path
+
+import Part
+import build_log
+
+log = build_log.get_logger(__name__)
+
+
+# Worker process state: named shapes for the assembly files.
+_shapes: Dict[str, Part.Shape] = {}
+
+
+def _write(brep: str, path: Optional[str], name: Optional[str]) -> Tuple[float, int]:
+    """
+    Worker: STEP file of a single shape, keep it under the 'name'.
+    :return: write time, file size
+    """
+    t_start = time.perf_counter()
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    if name is not None:
+        _shapes[name] = shape
+    if path is None:
+        return 0.0, 0
+    shape.exportStep(path)
+    return time.perf_counter() - t_start, os.path.getsize(path)
+
+
+def _clear() -> Tuple[float, int]:
+    """
+    Worker: forget the named shapes of the previous build.
+    """
+    _shapes.clear()
+    return 0.0, 0
+
+
+def _write_assembly(names: List[str], path: str) -> Tuple[float, int]:
+    """
+    Worker: STEP file of the named shapes, the names are kept as the STEP product names.
+    """
+    import FreeCAD
+    t_start = time.perf_counter()
+    doc = FreeCAD.newDocument("export")
+    try:
+        objects = []
+        for name in names:
+            obj = doc.addObject("Part::Feature", "part")
+            obj.Label = name
+            obj.Shape = _shapes[name]
+            objects.append(obj)
+        Part.export(objects, path)
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+    return time.perf_counter() - t_start, os.path.getsize(path)
+
+
+class ExportWriter:
+    def __init__(self, max_pending: int = 4):
+        self.max_pending = max_pending
+        # spawned, the builds run other threads (service, pools) that must not be forked
+        self._executor = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn"))
+        self._pending: Deque[Future] = collections.deque()
+        self._error: Optional[BaseException] = None
+        self.n_files = 0
+        self.n_bytes = 0
+        self.write_time = 0.0
+        self._t_start = time.perf_counter()
+
+    def write(self, shape: Part.Shape, path: Union[str, Path] = None, name: str = None):
+        """
+        Queue the shape for the STEP export, blocks while 'max_pending' shapes are waiting.
+        :param path: STEP file, None to just keep the shape for `write_assembly`
+        :param name: keep the shape under the name for `write_assembly`
+        """
+        brep = shape.exportBrepToString()
+        self._submit(_write, brep, None if path is None else str(path), name)
+
+    def write_assembly(self, names: List[str], path: Union[str, Path]):
+        """
+        Queue the STEP export of the shapes written before with given names.
+        """
+        self._submit(_write_assembly, list(names), str(path))
+
+    def _submit(self, fn: Callable, *args):
+        if self._error is not None:
+            raise self._error
+        while len(self._pending) >= self.max_pending:
+            self._collect(self._pending.popleft())
+            if self._error is not None:
+                raise self._error
+        self._pending.append(self._executor.submit(fn, *args))
+
+    def _collect(self, future: Future):
+        try:
+            write_time, n_bytes = future.result()
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+            return
+        if n_bytes > 0:
+            self.write_time += write_time
+            self.n_files += 1
+            self.n_bytes += n_bytes
+
+    def flush(self):
+        """
+        Wait for all queued files, log the throughput.
+        """
+        while self._pending:
+            self._collect(self._pending.popleft())
+        if self._error is not None:
+            raise self._error
+        mb = self.n_bytes / 1e6
+        rate = mb / self.write_time if self.write_time > 0 else 0.0
+        build_log.event(log, "export", files=self.n_files, mb=round(mb, 3),
+                        write_time=round(self.write_time, 3), mb_per_s=round(rate, 2),
+                        elapsed=round(time.perf_counter() - self._t_start, 3))
+
+    def clear(self, cancel: bool = False):
+        """
+        Start a new build: wait for the queued files, drop the named shapes, the error and the statistics.
+        Errors of the queued files belong to the finished build and are not raised.
+        :param cancel: cancel the files not started yet (the build failed)
+        """
+        while self._pending:
+            future = self._pending.popleft()
+            if not (cancel and future.cancel()):
+                future.exception()
+        self._pending.append(self._executor.submit(_clear))
+        self._error = None
+        self.n_files = 0
+        self.n_bytes = 0
+        self.write_time = 0.0
+        self._t_start = time.perf_counter()
+
+    def close(self, cancel: bool = False):
+        self._executor.shutdown(wait=True, cancel_futures=cancel)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.close(cancel=exc_type is not None)
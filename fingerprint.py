@@ -0,0 +1,102 @@
+"""
+Geometric fingerprints of the machined parts, regression check of the build optimizations.
+
+Fingerprint of a part: volume, surface area, bounding box and face count of the machined shape
+and a hash of the sorted operations snapped to the grid. Two builds are compared
+part by part with a tolerance instead of the STEP files.
+
+Usage:
+    reference = fingerprint.load("fingerprints.json")
+    current = fingerprint.fingerprints(wardrobe.placed_objects)
+    assert not fingerprint.compare(reference, current)
+"""
+from typing import *
+import hashlib
+import json
+from pathlib import Path
+import attrs
+import numpy as np
+
+import Part
+import snap
+import tool_shapes as ts
+from machine import OpTable
+from mesh_export import instance_key
+
+
+@attrs.define(frozen=True)
+class Fingerprint:
+    volume: float
+    area: float
+    bbox: Tuple[float, ...]     # xmin, ymin, zmin, xmax, ymax, zmax, part local coordinates
+    n_faces: int
+    ops_hash: str
+
+
+def ops_hash(placed: ts.PlacedPart, grid: snap.Grid = snap.DEFAULT_GRID) -> str:
+    """
+    Hash of the operations independent of their order, coordinates snapped to the grid.
+    """
+    table = OpTable.from_ops(placed.machine_ops)
+    rows = np.concatenate([table.kind[:, None],
+                           grid.index(np.stack([table.radius, table.length], axis=1)),
+                           grid.index(table.start), grid.index(table.direction), grid.index(table.end)],
+                          axis=1).astype(np.int64)
+    rows = rows[np.lexsort(rows.T[::-1])]
+    return hashlib.sha1(rows.tobytes()).hexdigest()
+
+
+def shape_fingerprint(shape: Part.Shape, op_hash: str) -> Fingerprint:
+    bb = shape.BoundBox
+    return Fingerprint(shape.Volume, shape.Area,
+                       (bb.XMin, bb.YMin, bb.ZMin, bb.XMax, bb.YMax, bb.ZMax),
+                       len(shape.Faces), op_hash)
+
+
+def fingerprints(placed_parts: List[ts.PlacedPart], shapes: List[Part.Shape] = None) -> Dict[str, Fingerprint]:
+    """
+    :param shapes: machined shapes of the parts if already available,
+        otherwise every distinct machined part is cut once
+    """
+    result = {}
+    cache = {}
+    for i, p in enumerate(placed_parts):
+        key = instance_key(p)
+        if key not in cache:
+            shape = shapes[i] if shapes is not None else p.apply_machine_ops()[0]
+            cache[key] = shape_fingerprint(shape, ops_hash(p))
+        result[p.name] = cache[key]
+    return result
+
+
+def compare(ref: Dict[str, Fingerprint], new: Dict[str, Fingerprint],
+            rel_tol: float = 1e-6, abs_tol: float = 1e-3) -> List[str]:
+    """
+    :return: list of differences, empty if the builds match
+    """
+    diffs = [f"{name}: missing" for name in ref if name not in new]
+    diffs += [f"{name}: new part" for name in new if name not in ref]
+    for name in ref:
+        if name not in new:
+            continue
+        a, b = ref[name], new[name]
+        for field in ['volume', 'area', 'bbox']:
+            va, vb = np.array(getattr(a, field)), np.array(getattr(b, field))
+            if not np.allclose(va, vb, rtol=rel_tol, atol=abs_tol):
+                diffs.append(f"{name}: {field} {getattr(a, field)} != {getattr(b, field)}")
+        for field in ['n_faces', 'ops_hash']:
+            if getattr(a, field) != getattr(b, field):
+                diffs.append(f"{name}: {field} {getattr(a, field)} != {getattr(b, field)}")
+    return diffs
+
+
+def save(fps: Dict[str, Fingerprint], path: Union[str, Path]):
+    with open(path, "w") as f:
+        json.dump({name: attrs.asdict(fp) for name, fp in fps.items()}, f, indent=1)
+
+
+def load(path: Union[str, Path]) -> Dict[str, Fingerprint]:
+    with open(path) as f:
+        data = json.load(f)
+    return {name: Fingerprint(d['volume'], d['area'], tuple(d['bbox']), d['n_faces'], d['ops_hash'])
+            for name, d in data.items()}
@@ -0,0 +1,162 @@
+"""
+Fitting templates compiled to flat operation tables.
+
+A fitting tool (see `tool_shapes.strong_edge`, `pin_edge`, `rail`) is a pair of sides (left, right),
+every side is a pair of operation trees (pannel ops, shelf ops). The template expands the trees once,
+keeps them as `OpTable`s. The canonical tool shapes are built in the cut stage,
+see `tool_pool` for their parallel construction.
+Applying the fitting to a pannel/shelf pair is then a single matrix product per part.
+
+Fittings are registered by name with their default parameters (`register_fitting`),
+`get_fitting` returns the template compiled once per parameter set.
+"""
+from typing import *
+import attrs
+import numpy as np
+from functools import lru_cache
+
+from machine import CNCOperation, OpTable, Transform, transform_matrix, matrix_key
+import tool_shapes as ts
+
+LEFT, RIGHT = 0, 1
+
+
+@attrs.define
+class FittingTemplate:
+    # sides[LEFT | RIGHT] = (pannel table, shelf table), in the fitting coordinates
+    sides: Tuple[Tuple[OpTable, OpTable], Tuple[OpTable, OpTable]]
+
+    @classmethod
+    def compile(cls, tool) -> 'FittingTemplate':
+        """
+        :param tool: (left side, right side), side is iterable of (pannel ops, shelf ops)
+        """
+        sides = []
+        for side in tool:
+            pannel_ops, shelf_ops = side
+            sides.append((OpTable.from_ops([pannel_ops]), OpTable.from_ops([shelf_ops])))
+        return cls(tuple(sides))
+
+    def tool_keys(self) -> Set[Tuple]:
+        keys = {op.tool_key
+                for side in self.sides for table in side
+                for op in table.to_ops()}
+        keys.discard(None)      # path mills have no canonical tool
+        return keys
+
+    def place(self, side: int, transform: Transform) -> Tuple[OpTable, OpTable]:
+        """
+        Fitting tables of given side moved by the transform.
+        """
+        mat = transform_matrix(transform)
+        pannel_table, shelf_table = self.sides[side]
+        return pannel_table.transformed(mat), shelf_table.transformed(mat)
+
+    def local_ops(self, side: int, i_part: int, local_mat: np.ndarray,
+                  memo: Dict[Tuple, Tuple[CNCOperation, ...]] = None) -> Tuple[CNCOperation, ...]:
+        """
+        Operations of the pannel (i_part=0) or of the shelf (i_part=1) table in the part local coordinates.
+        :param memo: placed operations of the build by (template, side, part, `matrix_key` of 'local_mat'),
+            the operations are immutable, so the parts with the same joint placement share them.
+            The key rounds the matrix, transforms closer than the rounding may still miss,
+            which costs just another table transform.
+        """
+        if memo is None:
+            return tuple(self.sides[side][i_part].transformed(local_mat).to_ops())
+        key = (id(self), side, i_part, matrix_key(local_mat))
+        ops = memo.get(key, None)
+        if ops is None:
+            ops = memo[key] = self.local_ops(side, i_part, local_mat)
+        return ops
+
+    def apply(self, pannel: ts.PlacedPart, shelf: ts.PlacedPart, side: int, transform: Transform,
+              memo: Dict[Tuple, Tuple[CNCOperation, ...]] = None):
+        """
+        Add the fitting operations placed by the global 'transform' to the pannel and to the shelf.
+        Transform and the part placements are composed first, so every table is transformed just once.
+        :param memo: placed operations shared within the build, see `local_ops`
+        """
+        mat = transform_matrix(transform)
+        for i_part, part in enumerate([pannel, shelf]):
+            if len(self.sides[side][i_part]):
+                local_mat = transform_matrix(part.placement.inverse()) @ mat
+                part.machine_ops.extend(self.local_ops(side, i_part, local_mat, memo))
+
+
+###################################
+# Registry of the pannel/shelf fittings.
+
+@attrs.define(frozen=True)
+class FittingDef:
+    name: str
+    version: int
+    builder: Callable           # builder(**params) -> (left side, right side) tool
+    defaults: Tuple[Tuple[str, Any], ...]
+    through_variant: bool       # builder accepts 'through', for fittings drilled through the pannel
+
+
+_registry: Dict[str, FittingDef] = {}
+
+
+def register_fitting(name: str, version: int = 1, through_variant: bool = False, **defaults):
+    """
+    Decorator registering a fitting builder under 'name'.
+    All builder parameters must be given in 'defaults'.
+    Increase 'version' when the definition changes, in order to invalidate compiled templates.
+    """
+    def decorator(builder):
+        params = dict(defaults)
+        if through_variant:
+            params.setdefault('through', False)
+        _registry[name] = FittingDef(name, version, builder, tuple(sorted(params.items())), through_variant)
+        return builder
+    return decorator
+
+
+def fitting_def(name: str) -> FittingDef:
+    try:
+        return _registry[name]
+    except KeyError:
+        raise KeyError(f"Unknown fitting: {name}, available: {sorted(_registry)}")
+
+
+@lru_cache(maxsize=None)
+def _compiled(name: str, version: int, params: Tuple[Tuple[str, Any], ...]) -> FittingTemplate:
+    return FittingTemplate.compile(_registry[name].builder(**dict(params)))
+
+
+def get_fitting(name: str, **params) -> FittingTemplate:
+    """
+    Compiled template of a registered fitting, memoized for every parameter set.
+    Parameters not used by the fitting are ignored.
+    """
+    fdef = fitting_def(name)
+    merged = dict(fdef.defaults)
+    merged.update({k: v for k, v in params.items() if k in merged})
+    return _compiled(name, fdef.version, tuple(sorted(merged.items())))
+
+
+@register_fitting("pins", shelf_width=600, z_step=40, dist_from_front=40)
+def _pins(shelf_width, z_step, dist_from_front):
+    return ts.side_symmetric(ts.pin_edge(shelf_width, z_step=z_step, dist_from_front=dist_from_front))
+
+
+@register_fitting("rastex", through_variant=True, thickness=18, shelf_width=600,
+                  dowel_to_pannel=14, dist_from_front=40, dowel_y=(-120, 20, 160), hetix_x=None)
+def _rastex(thickness, shelf_width, through, dowel_to_pannel, dist_from_front, dowel_y, hetix_x):
+    return ts.strong_edge(thickness, shelf_width, ts.rastex, through=through,
+                          dowel_to_pannel=dowel_to_pannel, dist_from_front=dist_from_front, dowel_y=dowel_y,
+                          hetix_x=hetix_x)
+
+
+@register_fitting("vb_strip", through_variant=True, thickness=18, shelf_width=600,
+                  dowel_to_pannel=14, dist_from_front=40, dowel_y=(-120, 20, 160), pin_z_shift=8)
+def _vb_strip(thickness, shelf_width, through, dowel_to_pannel, dist_from_front, dowel_y, pin_z_shift):
+    return ts.strong_edge(thickness, shelf_width, ts.vb, through=through,
+                          dowel_to_pannel=dowel_to_pannel, dist_from_front=dist_from_front, dowel_y=dowel_y,
+                          pin_z_shift=pin_z_shift)
+
+
+@register_fitting("rail", shelf_width=600, z_shift=47, x_depth=12, y_shift=2)
+def _rail(shelf_width, z_shift, x_depth, y_shift):
+    return ts.rail(z_shift=z_shift, x_depth=x_depth, shelf_width=shelf_width, y_shift=y_shift)
@@ -13,7 +13,8 @@ if freecad_path not in sys.path:
     sys.path.append(freecad_path)
     sys.path.append(script_dir)
 
-print(sys.path)
+import build_log
+build_log.get_logger(__name__).debug("sys.path: %s", sys.path)
 # Import FreeCAD modules
 import FreeCAD
 import Part
@@ -52,6 +53,10 @@ def make_box(dims, origin=None):
 
 ###################################š
 
+# Apply rigid transforms to shapes as a location change only.
+# False: rebuild geometry by every transform (original behaviour, kept for benchmarks).
+placement_transforms = True
+
 VecLike = Union[FreeCAD.Vector, Sequence[float]]
 def fvec(v: VecLike) -> FreeCAD.Vector:
     if isinstance(v, FreeCAD.Vector):
@@ -63,6 +68,13 @@ def fvec(v: VecLike) -> FreeCAD.Vector:
 def vec_list(vec: FreeCAD.Vector):
     return [vec.x, vec.y, vec.z]
 
+def qfloat(x: float) -> float:
+    """
+    Float with the transform noise removed (1e-9 mm), stored in the operation records
+    and used in the hash keys.
+    """
+    return round(float(x), 9) + 0.0
+
 
 ##########################
 
@@ -86,10 +98,30 @@ def translate(pos: Union[FreeCAD.Vector, List[float]]) -> 'Transform':
     placement = FreeCAD.Placement(pos, FreeCAD.Rotation())
     return Transform(placement)
 
-@attrs.define
+@attrs.define(eq=False)
 class Transform:
+    """
+    Equality and hash are given by the placement matrix rounded by `qfloat`,
+    so equal transforms composed in a different way are interchangeable as cache keys.
+    Rounding is not a tolerance: values 1e-16 apart may round differently,
+    the caches keyed by transforms treat that as a miss, which costs just a recomputation.
+    """
     placement: FreeCAD.Placement
 
+    def key(self) -> Tuple[float, ...]:
+        """
+        Top three rows of the placement matrix, quantized, see also `machine.matrix_key`.
+        """
+        return tuple(qfloat(x) for x in self.placement.toMatrix().A[:12])
+
+    def __eq__(self, other):
+        if not isinstance(other, Transform):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
     def __matmul__(self, other: 'Transform'):
         """
         composition of transformations.
@@ -106,11 +138,12 @@ class Transform:
         Apply the stored transform to the right-hand operand (shape or vector).
         """
         if isinstance(shape, Part.Shape):
-
-            # Apply the placement transform to the shape
             mat = self.placement.toMatrix()
-            transformed_shape = shape.transformGeometry(mat)
-            return transformed_shape
+            if not placement_transforms:
+                return shape.transformGeometry(mat)
+            # Rigid matrix changes just the shape location, geometry is shared.
+            # Geometry is rebuilt only if the matrix contains scaling.
+            return shape.transformed(mat, copy=False, checkScale=True)
         elif isinstance(shape, FreeCAD.Vector):
             return self.placement.multVec(shape)
         else:
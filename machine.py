@@ -2,11 +2,11 @@ from typing import *
 import sys
 import attrs
 import numpy as np
-from functools import cached_property
+from functools import cached_property, lru_cache
 
 import FreeCAD
 import Part
-from freecad import Transform, rotate, translate, fuse, make_box, make_cylinder
+from freecad import Transform, rotate, translate, fuse, make_box, make_cylinder, qfloat
 
 
 def normalize(v):
@@ -31,8 +31,20 @@ def fvec(v: VecLike) -> FreeCAD.Vector:
         v = list(v)
         return FreeCAD.Vector(*v)
 
-def vec_list(vec: FreeCAD.Vector):
-    return [vec.x, vec.y, vec.z]
+def vec_list(vec: VecLike):
+    if isinstance(vec, FreeCAD.Vector):
+        return [vec.x, vec.y, vec.z]
+    return [float(x) for x in vec]
+
+
+Vec3 = Tuple[float, float, float]
+
+def ftuple(v: VecLike) -> Vec3:
+    """
+    Compact hashable vector of the operation records.
+    """
+    x, y, z = vec_list(v)
+    return qfloat(x), qfloat(y), qfloat(z)
 
 
 ##########################
@@ -41,14 +53,170 @@ def vec_list(vec: FreeCAD.Vector):
 ##########################š
 
 
-def vector_origin():
-    return FreeCAD.Vector(0, 0, 0)
+def key_float(x: float) -> float:
+    """
+    Float rounded for use in tool keys, removes the float noise of transforms.
+    """
+    return round(float(x), 6) + 0.0
+
+
+def slot_tool_shape(radius, length, x_end):
+    """
+    Mill tool in canonical position for the move perpendicular to the tool:
+    tool along Z axis moving from origin to [x_end, 0, 0], x_end >= 0.
+    Exact solid constructed directly as the extruded slot (stadium) profile.
+    Volume: pi * radius**2 * length + 2 * radius * x_end * length
+    """
+    if x_end < 1e-6:
+        return Part.makeCylinder(radius, length)
+    r, d = radius, x_end
+    z_axis = fvec([0, 0, 1])
+    edges = [
+        Part.LineSegment(fvec([0, -r, 0]), fvec([d, -r, 0])),
+        Part.ArcOfCircle(Part.Circle(fvec([d, 0, 0]), z_axis, r), -np.pi / 2, np.pi / 2),
+        Part.LineSegment(fvec([d, r, 0]), fvec([0, r, 0])),
+        Part.ArcOfCircle(Part.Circle(fvec([0, 0, 0]), z_axis, r), np.pi / 2, 3 * np.pi / 2),
+    ]
+    profile = Part.Face(Part.Wire([e.toShape() for e in edges]))
+    return profile.extrude(fvec([0, 0, length]))
+
+
+def lofted_mill_tool_shape(radius, length, x_end, z_end):
+    """
+    Mill tool in canonical position: tool along Z axis moving from origin to [x_end, 0, z_end].
+    Fuse of the end cylinders and lofts, general but slow. Used for the moves
+    not perpendicular to the tool, see `slot_tool_shape` for the perpendicular ones.
+    """
+    can_end = fvec([x_end, 0, z_end])
+    # Create the milling tool (cylinder) at the start position
+    start_cylinder = make_cylinder(radius, length)
+    # Create the milling tool (cylinder) at the end position
+    end_cylinder = make_cylinder(radius, length) @ translate(can_end)
+
+    # Create profiles at the start and end positions
+    # Side profiles (rectangle wires)
+    rectangle_points = list(map(fvec, [
+        (0, -radius, 0),
+        (0, radius, 0),
+        (0, radius, length),
+        (0, -radius, length),
+        ( 0, -radius, 0)
+    ]))
+    rectangle_wire_start = Part.makePolygon(rectangle_points)
+    rectangle_wire_end = rectangle_wire_start.copy() @ translate(can_end)
+    # Loft between the start and end rectangle wires to create the side sweep
+    side_sweep = Part.makeLoft([rectangle_wire_start, rectangle_wire_end], True)
+
+    components = [start_cylinder, end_cylinder, side_sweep]
+    if abs(can_end.z) > 1e-6:
+        # move no perpendicular to tool 'direction'
+        # have to add top and bottom domes using loft
+
+        # Top circle wires at the start and end positions
+        top_circle_edge_start = Part.makeCircle(radius, fvec([0, 0, length]))
+        top_circle_wire_start = Part.Wire([top_circle_edge_start])
+        top_circle_wire_end = top_circle_wire_start.copy() @ translate(can_end)
+        # Loft between the top circle wires
+        top_sweep = Part.makeLoft([top_circle_wire_start, top_circle_wire_end], True)
+        components.append(top_sweep)
+
+        # Bottom circle wires at the start and end positions
+        bottom_circle_edge_start = Part.makeCircle(radius)
+        bottom_circle_wire_start = Part.Wire([bottom_circle_edge_start])
+        bottom_circle_wire_end = bottom_circle_wire_start.copy() @ translate(can_end)
+        # Loft between the bottom circle wires
+        bottom_sweep = Part.makeLoft([bottom_circle_wire_start, bottom_circle_wire_end], True)
+        components.append(bottom_sweep)
+
+    return fuse(components)
+
+
+# Optional source of prebuilt tool solids, provider(key) -> shape or None, see `tool_pool.ToolPrecompute`
+ToolProvider = Callable[[Tuple], Optional[Part.Shape]]
+
+
+def build_tool(key: Tuple) -> Part.Shape:
+    """
+    Construct the canonical tool solid of given 'tool_key', no caching.
+    ('drill', radius, length) : cylinder from origin along Z axis
+    ('mill', radius, length, x_end, z_end) : see `slot_tool_shape`, `lofted_mill_tool_shape`
+    """
+    kind, *params = key
+    if kind == 'drill':
+        radius, length = params
+        return Part.makeCylinder(radius, length)
+    elif kind == 'mill':
+        radius, length, x_end, z_end = params
+        if abs(z_end) < 1e-6:
+            return slot_tool_shape(radius, length, x_end)
+        return lofted_mill_tool_shape(radius, length, x_end, z_end)
+    raise ValueError(f"Unknown tool kind: {kind}")
+
+
+# canonical tool solids by the tool key, filled by `canonical_tool`
+_tools: Dict[Tuple, Part.Shape] = {}
+
+
+def canonical_tool(key: Tuple, provider: ToolProvider = None) -> Part.Shape:
+    """
+    Tool solid in canonical position shared by all operations with the same 'tool_key'.
+    Operations place it by a rigid transform, which is just a location change.
+    Taken from the 'provider' of the calling build if given, built otherwise, cached for the process.
+    """
+    shape = _tools.get(key, None)
+    if shape is None:
+        if provider is not None:
+            shape = provider(key)
+        if shape is None:
+            shape = build_tool(key)
+        shape = _tools.setdefault(key, shape)
+    return shape
 
-def vector_z():
-    return FreeCAD.Vector(0, 0, 1)
+
+def tool_cached(key: Tuple) -> bool:
+    return key in _tools
+
+
+def clear_tool_cache():
+    _tools.clear()
+    _placed_tool.cache_clear()
+
+
+# max. number of the placed tool shapes kept, see `placed_tool`
+PLACED_TOOLS = 4096
+
+
+def placed_tool(op: 'CNCOperation', provider: ToolProvider = None) -> Part.Shape:
+    """
+    Tool shape of the elementary operation in the part coordinates.
+    Operations keep no geometry, the placed tools are cached by (tool_key, tool transform),
+    so the equal operations of the repeated parts and joints share the shape.
+    :param provider: source of the canonical tools, see `canonical_tool`
+    """
+    key = op.tool_key
+    if key is None:
+        return op.tool_shape
+    if provider is not None:
+        canonical_tool(key, provider)
+    return _placed_tool(key, op.tool_transform)
+
+
+@lru_cache(maxsize=PLACED_TOOLS)
+def _placed_tool(key: Tuple, transform: Transform) -> Part.Shape:
+    return canonical_tool(key) @ transform
+
+
+ORIGIN = (0.0, 0.0, 0.0)
+AXIS_Z = (0.0, 0.0, 1.0)
 
 class NoneOp:
 
+    def __eq__(self, other):
+        return isinstance(other, NoneOp)
+
+    def __hash__(self):
+        return hash(NoneOp)
+
     def _apply(self, transform: Transform):
         return self
 
@@ -61,16 +229,18 @@ class NoneOp:
     def expand(self):
         return []
 
-@attrs.define
+@attrs.define(frozen=True)
 class DrillOp:
     """
     Drill Operation bahaves like a Cylinder.
     Default start is at origin and drilling upward in Z axis.
+    Frozen slotted record of floats, hashable. The tool solid is cached by `tool_key`,
+    see `canonical_tool`, the operation keeps no geometry.
     """
-    radius = attrs.field(type=float)
-    length = attrs.field(type=float)
-    start = attrs.field(type=FreeCAD.Vector, default=attrs.Factory(vector_origin), converter=fvec)
-    direction = attrs.field(type=FreeCAD.Vector, default=attrs.Factory(vector_z), converter=fvec)
+    radius = attrs.field(type=float, converter=float)
+    length = attrs.field(type=float, converter=float)
+    start = attrs.field(type=Vec3, default=ORIGIN, converter=ftuple)
+    direction = attrs.field(type=Vec3, default=AXIS_Z, converter=ftuple)
 
 
     def __repr__(self):
@@ -80,39 +250,47 @@ class DrillOp:
         return DrillOp(
             self.radius,
             self.length,
-            start = self.start @ transform,
-            direction= self.direction @ transform.rotation(),
+            start = fvec(self.start) @ transform,
+            direction= fvec(self.direction) @ transform.rotation(),
             )
 
     def __matmul__(self, transform: Transform):
         return self._apply(transform)
 
-    @cached_property
+    @property
+    def tool_key(self):
+        return ('drill', key_float(self.radius), key_float(self.length))
+
+    @property
+    def tool_transform(self) -> Transform:
+        return rotate([0, 0, 1], self.direction) @ translate(self.start)
+
+    @property
     def tool_shape(self):
-        return  (Part.makeCylinder(self.radius, self.length)
-                 @ rotate([0, 0, 1], self.direction)
-                 @ translate(self.start))
+        # location change of the cached canonical tool
+        return placed_tool(self)
 
     def copy(self):
-        return DrillOp(self.radius, self.length, self.start, self.direction)
+        return self
 
     def expand(self):
         return [self]
 
 
-@attrs.define
+@attrs.define(frozen=True)
 class MillOp:
     """
     Mill Operation bahaves like a Cylinder fused over a path.
     Default start is at origin and drilling upward in Z axis.
+    Frozen slotted record of floats, hashable, see `DrillOp`.
     """
-    radius = attrs.field(type=float)
-    length = attrs.field(type=float)    # Active length of the tool.
-    direction = attrs.field(type=FreeCAD.Vector, converter=fvec)
+    radius = attrs.field(type=float, converter=float)
+    length = attrs.field(type=float, converter=float)    # Active length of the tool.
+    direction = attrs.field(type=Vec3, converter=ftuple)
     # Direction of the tool while moving
-    start = attrs.field(type=FreeCAD.Vector, converter=fvec)
+    start = attrs.field(type=Vec3, converter=ftuple)
     # Start point of move
-    end = attrs.field(type=FreeCAD.Vector, converter=fvec)
+    end = attrs.field(type=Vec3, converter=ftuple)
 
     def __repr__(self):
         return f"Mill(r={self.radius}, l={self.length}): ^[{vec_list(self.direction)}], [{vec_list(self.start)}] -> [{vec_list(self.end)}]"
@@ -121,25 +299,24 @@ class MillOp:
         return MillOp(
             self.radius,
             self.length,
-            self.direction  @ transform.rotation(),
-            start = self.start @ transform,
-            end = self.end @ transform
+            fvec(self.direction)  @ transform.rotation(),
+            start = fvec(self.start) @ transform,
+            end = fvec(self.end) @ transform
             )
 
     def __matmul__(self, transform: Transform):
         return self._apply(transform)
 
-    @cached_property
-    def tool_shape(self):
-        radius, length = self.radius, self.length
+    def _canonical(self) -> Tuple[Tuple, Transform]:
+        """
+        Ratation to canonical position.
+        direction -> Z axis
+        XYmovment_vec -> X axis
+        :return: tool key of the canonical tool, transform from canonical position
+        """
         direction, start, end = map(np.array, [self.direction, self.start, self.end])
-
         # Normalize the direction vector
         direction = normalize(direction)
-
-        # Ratation to canonical position.
-        # direction -> Z axis
-        # XYmovment_vec -> X axis
         dir_rot = rotate(direction, [0, 0, 1])
         move_vec = vec_list(fvec(end - start) @ dir_rot)
         xy_move_vec = move_vec.copy()
@@ -148,65 +325,317 @@ class MillOp:
         can_rot = dir_rot @ move_rot
         can_end = fvec(move_vec) @ move_rot
         assert abs(can_end.y) < 1e-6, f"Canonical end points: {vec_list(can_end)}"
+        key = ('mill', key_float(self.radius), key_float(self.length), key_float(can_end.x), key_float(can_end.z))
+        return key, can_rot.inverse() @ translate(start)
+
+    @property
+    def tool_key(self):
+        return _mill_canonical(self)[0]
+
+    @property
+    def tool_transform(self) -> Transform:
+        return _mill_canonical(self)[1]
+
+    @property
+    def tool_shape(self):
+        return placed_tool(self)
+
+    def copy(self):
+        return self
+
+    def expand(self):
+        return [self]
+
+
+@lru_cache(maxsize=PLACED_TOOLS)
+def _mill_canonical(op: MillOp) -> Tuple[Tuple, Transform]:
+    # the record is frozen, the canonical position is computed once per distinct operation
+    return op._canonical()
+
+
+def arc_points(p0: np.ndarray, mid: np.ndarray, p1: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Points of the circular arc through p0, mid, p1; chord deviation less then 'tolerance'.
+    :return: (K, 3) array from p0 to p1
+    """
+    u, v = mid - p0, p1 - p0
+    w = np.cross(u, v)
+    w2 = w @ w
+    center = p0 + ((u @ u) * np.cross(v, w) + (v @ v) * np.cross(w, u)) / (2 * w2)
+    radius = np.linalg.norm(p0 - center)
+    e1 = (p0 - center) / radius
+    e2 = np.cross(w / np.sqrt(w2), e1)
+    # arc orientation p0 -> mid -> p1 is positive around 'w'
+    d1 = p1 - center
+    angle = np.arctan2(d1 @ e2, d1 @ e1) % (2 * np.pi)
+    max_step = 2 * np.arccos(max(1 - tolerance / radius, -1.0))
+    n = max(2, int(np.ceil(angle / max_step)) + 1)
+    phi = np.linspace(0, angle, n)
+    pts = center + radius * (np.cos(phi)[:, None] * e1 + np.sin(phi)[:, None] * e2)
+    pts[-1] = p1
+    return pts
+
+
+def path_array(points) -> np.ndarray:
+    return np.asarray(points, dtype=float).reshape(-1, 3)
+
+
+@attrs.define(eq=False)
+class PathMillOp:
+    """
+    Mill Operation moving the tool of fixed 'direction' along a polyline 'points'.
+    Segment i is an arc through 'arc_mid[i]' or straight if the row is NaN (or arc_mid is None).
+    The path must lay in a plane perpendicular to the tool direction.
+    Single swept solid and continuous toolpath instead of a chain of MillOps.
+    """
+    radius = attrs.field(type=float)
+    length = attrs.field(type=float)    # Active length of the tool.
+    direction = attrs.field(type=FreeCAD.Vector, converter=fvec)
+    points = attrs.field(type=np.ndarray, converter=path_array)
+    arc_mid = attrs.field(type=np.ndarray, default=None,
+                          converter=attrs.converters.optional(path_array))
+
+    def __repr__(self):
+        n_arcs = 0 if self.arc_mid is None else int(np.sum(~np.isnan(self.arc_mid[:, 0])))
+        return (f"PathMill(r={self.radius}, l={self.length}): ^[{vec_list(self.direction)}], "
+                f"[{self.points[0].tolist()}] -> ({len(self.points)} points, {n_arcs} arcs) -> [{self.points[-1].tolist()}]")
+
+    @property
+    def start(self) -> FreeCAD.Vector:
+        return fvec(self.points[0].tolist())
+
+    @property
+    def end(self) -> FreeCAD.Vector:
+        return fvec(self.points[-1].tolist())
+
+    def _apply(self, transform: Transform):
+        mat = transform_matrix(transform)
+        rot, shift = mat[:3, :3], mat[:3, 3]
+        arc_mid = None if self.arc_mid is None else self.arc_mid @ rot.T + shift
+        return PathMillOp(
+            self.radius,
+            self.length,
+            self.direction @ transform.rotation(),
+            self.points @ rot.T + shift,
+            arc_mid)
 
-        # Create the milling tool (cylinder) at the start position
-        start_cylinder = make_cylinder(radius, length)
-        # Create the milling tool (cylinder) at the end position
-        end_cylinder = make_cylinder(radius, length) @ translate(can_end)
-
-        # Create profiles at the start and end positions
-        # Side profiles (rectangle wires)
-        rectangle_points = list(map(fvec, [
-            (0, -radius, 0),
-            (0, radius, 0),
-            (0, radius, length),
-            (0, -radius, length),
-            ( 0, -radius, 0)
-        ]))
-        rectangle_wire_start = Part.makePolygon(rectangle_points)
-        rectangle_wire_end = rectangle_wire_start.copy() @ translate(can_end)
-        # Loft between the start and end rectangle wires to create the side sweep
-        side_sweep = Part.makeLoft([rectangle_wire_start, rectangle_wire_end], True)
-
-        components = [start_cylinder, end_cylinder, side_sweep]
-        if abs(can_end.z) > 1e-6:
-            # move no perpendicular to tool 'direction'
-            # have to add top and bottom domes using loft
-
-            # Top circle wires at the start and end positions
-            top_circle_edge_start = Part.makeCircle(radius, fvec([0, 0, length]))
-            top_circle_wire_start = Part.Wire([top_circle_edge_start])
-            top_circle_wire_end = top_circle_wire_start.copy() @ translate(can_end)
-            # Loft between the top circle wires
-            top_sweep = Part.makeLoft([top_circle_wire_start, top_circle_wire_end], True)
-            components.append(top_sweep)
-
-            # Bottom circle wires at the start and end positions
-            bottom_circle_edge_start = Part.makeCircle(radius)
-            bottom_circle_wire_start = Part.Wire([bottom_circle_edge_start])
-            bottom_circle_wire_end = bottom_circle_wire_start.copy() @ translate(can_end)
-            # Loft between the bottom circle wires
-            bottom_sweep = Part.makeLoft([bottom_circle_wire_start, bottom_circle_wire_end], True)
-            components.append(bottom_sweep)
-
-        return fuse(components) @ can_rot.inverse() @ translate(start)
+    def __matmul__(self, transform: Transform):
+        return self._apply(transform)
+
+    def _is_arc(self, i):
+        return self.arc_mid is not None and not np.any(np.isnan(self.arc_mid[i]))
+
+    def wire(self) -> Part.Wire:
+        edges = []
+        for i in range(len(self.points) - 1):
+            p0, p1 = fvec(self.points[i].tolist()), fvec(self.points[i + 1].tolist())
+            if self._is_arc(i):
+                edges.append(Part.Arc(p0, fvec(self.arc_mid[i].tolist()), p1).toShape())
+            else:
+                edges.append(Part.LineSegment(p0, p1).toShape())
+        return Part.Wire(edges)
+
+    @property
+    def tool_key(self):
+        return None
+
+    @cached_property
+    def tool_shape(self):
+        direction = normalize(np.array(vec_list(self.direction)))
+        heights = self.points @ direction
+        assert np.ptp(heights) < 1e-6, "Path not perpendicular to the tool direction."
+        extrude_vec = fvec((direction * self.length).tolist())
+        if len(self.points) < 2:
+            return make_cylinder(self.radius, self.length, axis=self.direction, origin=self.points[0])
+        offsets = self.points - self.points[0]
+        if self.arc_mid is None or np.all(np.isnan(self.arc_mid)):
+            if np.linalg.matrix_rank(offsets, tol=1e-6) <= 1:
+                # straight path, no plane for the 2D offset, single slot between the extreme points
+                axis = offsets[np.argmax(np.linalg.norm(offsets, axis=1))]
+                t = offsets @ axis
+                op = MillOp(self.radius, self.length, self.direction,
+                            start=self.points[np.argmin(t)], end=self.points[np.argmax(t)])
+                return op.tool_shape
+        # closed outline around the open path, round ends and joins
+        outline = self.wire().makeOffset2D(self.radius, join=0, fill=False, openResult=False)
+        return Part.Face(outline).extrude(extrude_vec)
+
+    def toolpath(self, tolerance: float = 0.01) -> np.ndarray:
+        """
+        Continuous tool center path, arcs discretized with chord deviation below 'tolerance'.
+        :return: (K, 3) array
+        """
+        pts = [self.points[:1]]
+        for i in range(len(self.points) - 1):
+            if self._is_arc(i):
+                pts.append(arc_points(self.points[i], self.arc_mid[i], self.points[i + 1], tolerance)[1:])
+            else:
+                pts.append(self.points[i + 1:i + 2])
+        return np.concatenate(pts)
 
     def copy(self):
-        return MillOp(self.radius, self.length, self.direction, self.start, self.end)
+        return PathMillOp(self.radius, self.length, self.direction, self.points.copy(),
+                          None if self.arc_mid is None else self.arc_mid.copy())
 
     def expand(self):
         return [self]
 
 
-CNCOperation = Union[DrillOp, MillOp, 'OperationList']
+def zigzag(polygon: np.ndarray, radius: float, stepover: float) -> np.ndarray:
+    """
+    Zig-zag tool center path inside a 2D polygon, scan lines parallel to the X axis.
+    Scan line crossings with all polygon edges are computed at once, crossings are paired by the even-odd rule,
+    every interval is shortened so that the tool keeps distance 'radius' from the crossed edges.
+    Intervals of a single scan line (non-convex pockets) are visited in order.
+    Pass order: scan lines by increasing Y, the first line in the +X direction, then alternating.
+    :param polygon: (N, 2) vertices of a closed polygon
+    :return: (M, 2) points, pairs of points are the passes, alternating direction
+    """
+    a, b = polygon, np.roll(polygon, -1, axis=0)
+    y_min, y_max = np.min(polygon[:, 1]) + radius, np.max(polygon[:, 1]) - radius
+    if y_max < y_min:
+        return np.empty((0, 2))
+    n_lines = int(np.floor((y_max - y_min) / stepover + 1e-9)) + 1
+    ys = np.linspace(y_min, y_max, n_lines) if n_lines > 1 else np.array([(y_min + y_max) / 2])
+    # (lines, edges) crossings, half open edge intervals count shared vertices just once
+    edge_lo, edge_hi = np.minimum(a[:, 1], b[:, 1]), np.maximum(a[:, 1], b[:, 1])
+    hit = (ys[:, None] >= edge_lo[None, :]) & (ys[:, None] < edge_hi[None, :])
+    edge = b - a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (ys[:, None] - a[None, :, 1]) / edge[None, :, 1]
+        # X shift keeping the tool at 'radius' distance from the edge line
+        shift = radius * np.linalg.norm(edge, axis=1) / np.abs(edge[:, 1])
+    x = np.where(hit, a[None, :, 0] + t * edge[None, :, 0], np.nan)
+    order = np.argsort(x, axis=1)
+    x = np.take_along_axis(x, order, axis=1)
+    shift = np.where(hit, shift[None, :], np.nan)
+    shift = np.take_along_axis(shift, order, axis=1)
+    n_cross = x.shape[1] - x.shape[1] % 2
+    lo = x[:, 0:n_cross:2] + shift[:, 0:n_cross:2]
+    hi = x[:, 1:n_cross:2] - shift[:, 1:n_cross:2]
+    passes = np.stack([lo, hi], axis=2)          # (lines, intervals, 2)
+    # alternate direction of odd lines
+    passes[1::2] = passes[1::2, ::-1, ::-1]
+    valid = passes[..., 1] - passes[..., 0]
+    valid[1::2] = -valid[1::2]
+    valid = valid >= 0              # NaN intervals are not valid
+    px = passes[valid].reshape(-1)
+    py = np.repeat(np.broadcast_to(ys[:, None], valid.shape)[valid], 2)
+    return np.stack([px, py], axis=1)
+
+
+@attrs.define(eq=False)
+class PocketOp:
+    """
+    Pocket Operation, prism of a planar 'polygon' extruded by 'depth' in the tool 'direction'.
+    The polygon lays on the part surface in the plane perpendicular to the direction.
+    Geometry is cut by the prism at once (inner corners are sharp, not rounded by the tool),
+    the machine path is the zig-zag computed by 'toolpath'.
+    """
+    radius = attrs.field(type=float)
+    depth = attrs.field(type=float)
+    direction = attrs.field(type=FreeCAD.Vector, converter=fvec)
+    polygon = attrs.field(type=np.ndarray, converter=path_array)     # (N, 3) vertices
+    stepover = attrs.field(type=float, default=None)    # distance of the passes, default is the tool radius
+
+    def __repr__(self):
+        return (f"Pocket(r={self.radius}, d={self.depth}): ^[{vec_list(self.direction)}], "
+                f"{len(self.polygon)} vertices from [{self.polygon[0].tolist()}]")
+
+    @property
+    def length(self):
+        return self.depth
+
+    @property
+    def start(self) -> FreeCAD.Vector:
+        return fvec(self.polygon[0].tolist())
+
+    @property
+    def end(self) -> FreeCAD.Vector:
+        return self.start
+
+    def _apply(self, transform: Transform):
+        mat = transform_matrix(transform)
+        return PocketOp(
+            self.radius,
+            self.depth,
+            self.direction @ transform.rotation(),
+            self.polygon @ mat[:3, :3].T + mat[:3, 3],
+            self.stepover)
+
+    def __matmul__(self, transform: Transform):
+        return self._apply(transform)
+
+    @property
+    def tool_key(self):
+        return None
+
+    def frame(self) -> np.ndarray:
+        """
+        Rows: pocket plane axes e1, e2 and the tool direction.
+        e1 is along the first polygon edge, (e1, e2) is right-handed seen from the tool side,
+        i.e. e2 = n x e1 for the face normal n = -direction.
+        A pocket cut downwards has e1, e2 along +X, +Y for a polygon starting with a +X edge.
+        """
+        e3 = normalize(np.array(vec_list(self.direction)))
+        e1 = normalize(self.polygon[1] - self.polygon[0])
+        return np.array([e1, np.cross(-e3, e1), e3])
+
+    @cached_property
+    def tool_shape(self):
+        heights = self.polygon @ self.frame()[2]
+        assert np.ptp(heights) < 1e-6, "Pocket polygon not perpendicular to the tool direction."
+        vertices = [fvec(p) for p in self.polygon.tolist()]
+        outline = Part.makePolygon(vertices + vertices[:1])
+        return Part.Face(outline).extrude(self.direction * self.depth)
+
+    def toolpath(self) -> np.ndarray:
+        """
+        Zig-zag tool center path at the pocket bottom, see `zigzag` in the `frame` coordinates:
+        passes along e1 ordered by increasing e2, the first one in the +e1 direction.
+        :return: (M, 3) points, consecutive pairs are the passes
+        """
+        stepover = self.radius if self.stepover is None else self.stepover
+        frame = self.frame()
+        origin = self.polygon[0]
+        uv = (self.polygon - origin) @ frame[:2].T
+        path = zigzag(uv, self.radius, stepover)
+        return origin + path @ frame[:2] + self.depth * frame[2]
+
+    def copy(self):
+        return PocketOp(self.radius, self.depth, self.direction, self.polygon.copy(), self.stepover)
+
+    def expand(self):
+        return [self]
+
+
+CNCOperation = Union[DrillOp, MillOp, PathMillOp, PocketOp, 'OperationList']
 
 class OperationList:
+    """
+    Tree of operations, equal and hashable by value if all its leaves are
+    (DrillOp, MillOp, NoneOp and nested lists, path mills and pockets compare by identity).
+    """
     def __init__(self, *ops):
-        self._ops: List[CNCOperation] = ops
+        self._ops: Tuple[CNCOperation, ...] = tuple(ops)
+        self._hash = None
 
     def __iter__(self):
         return iter(self._ops)
 
+    def __eq__(self, other):
+        if not isinstance(other, OperationList):
+            return NotImplemented
+        return self is other or self._ops == other._ops
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(self._ops)
+        return self._hash
+
+    def __repr__(self):
+        return f"OperationList{self._ops}"
+
     def _apply(self, transform):
         return OperationList(*[x._apply(transform) for x in self._ops])
 
@@ -223,3 +652,157 @@ class OperationList:
         for o in self._ops:
             ops.extend(o.expand())
         return ops
+
+
+def transform_matrix(transform: Transform) -> np.ndarray:
+    """
+    Transform as 4x4 numpy matrix acting on column vectors.
+    """
+    return np.array(transform.placement.toMatrix().A, dtype=float).reshape(4, 4)
+
+
+def matrix_key(mat: np.ndarray) -> Tuple[float, ...]:
+    """
+    Hashable key of the 4x4 transform matrix, equal to the `Transform.key` of the same transform.
+    """
+    return tuple(qfloat(x) for x in np.asarray(mat)[:3].reshape(-1))
+
+
+def matrix_transform(mat: np.ndarray) -> Transform:
+    """
+    Transform from a rigid 4x4 numpy matrix, inverse of `transform_matrix`.
+    """
+    return Transform(FreeCAD.Placement(FreeCAD.Matrix(*np.asarray(mat, dtype=float).reshape(-1).tolist())))
+
+
+DRILL, MILL, PATH, POCKET = 0, 1, 2, 3
+OP_KIND = {DrillOp: DRILL, MillOp: MILL, PathMillOp: PATH, PocketOp: POCKET}
+
+@attrs.define
+class OpTable:
+    """
+    Flat array representation of expanded elementary operations (DrillOp, MillOp, PathMillOp, PocketOp).
+    Allows to place and transform many operations at once.
+    Row i is a drill (kind[i] == DRILL), a mill (kind[i] == MILL), a path mill (kind[i] == PATH)
+    or a pocket (kind[i] == POCKET).
+    'end' equals 'start' for the drills and pockets, start and end are the path end points for the path mills,
+    'length' is the depth of the pockets.
+    """
+    kind: np.ndarray        # (N,) int
+    radius: np.ndarray      # (N,)
+    length: np.ndarray      # (N,)
+    start: np.ndarray       # (N, 3)
+    direction: np.ndarray   # (N, 3)
+    end: np.ndarray         # (N, 3)
+    # (N,) object array, (points, arc_mid) of the PATH rows, (polygon, stepover) of the POCKET rows,
+    # None for other rows; None if there is no such row
+    path: np.ndarray = None
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=int), np.empty(0), np.empty(0),
+                   np.empty((0, 3)), np.empty((0, 3)), np.empty((0, 3)))
+
+    @classmethod
+    def drills(cls, radius, length, start, direction):
+        """
+        Table of drills, 'radius' and 'length' are broadcasted to the rows of 'start'.
+        """
+        start = np.asarray(start, dtype=float).reshape(-1, 3)
+        n = len(start)
+        direction = np.broadcast_to(np.asarray(direction, dtype=float), (n, 3)).copy()
+        return cls(np.full(n, DRILL),
+                   np.broadcast_to(np.asarray(radius, dtype=float), (n,)).copy(),
+                   np.broadcast_to(np.asarray(length, dtype=float), (n,)).copy(),
+                   start, direction, start.copy())
+
+    @classmethod
+    def from_ops(cls, ops: Iterable[CNCOperation]):
+        """
+        Table from the operation tree, the tree is expanded first.
+        """
+        ops = [o for op in ops for o in op.expand()]
+        if not ops:
+            return cls.empty()
+        kind = np.array([OP_KIND[type(op)] for op in ops])
+        radius = np.array([op.radius for op in ops], dtype=float)
+        length = np.array([op.length for op in ops], dtype=float)
+        start = np.array([vec_list(op.start) for op in ops], dtype=float)
+        direction = np.array([vec_list(op.direction) for op in ops], dtype=float)
+        end = np.array([vec_list(op.start) if k == DRILL else vec_list(op.end)
+                        for op, k in zip(ops, kind)], dtype=float)
+        path = None
+        if np.any(kind >= PATH):
+            path = np.empty(len(ops), dtype=object)
+            for i, op in enumerate(ops):
+                if kind[i] == PATH:
+                    path[i] = (op.points, op.arc_mid)
+                elif kind[i] == POCKET:
+                    path[i] = (op.polygon, op.stepover)
+        return cls(kind, radius, length, start, direction, end, path)
+
+    def path_column(self) -> np.ndarray:
+        if self.path is None:
+            return np.full(len(self), None, dtype=object)
+        return self.path
+
+    @classmethod
+    def concat(cls, tables: Sequence['OpTable']):
+        if not tables:
+            return cls.empty()
+        path = None
+        if any(t.path is not None for t in tables):
+            path = np.concatenate([t.path_column() for t in tables])
+        return cls(*[np.concatenate([getattr(t, f.name) for t in tables])
+                     for f in attrs.fields(cls) if f.name != 'path'], path)
+
+    def __len__(self):
+        return len(self.kind)
+
+    def __getitem__(self, sel):
+        """
+        Subset of rows, 'sel' is an index array, slice or a bool mask.
+        """
+        return OpTable(*[None if getattr(self, f.name) is None else getattr(self, f.name)[sel]
+                         for f in attrs.fields(OpTable)])
+
+    def transformed(self, mat: np.ndarray) -> 'OpTable':
+        """
+        Apply 4x4 rigid transformation matrix to all rows.
+        """
+        rot, shift = mat[:3, :3], mat[:3, 3]
+        path = None
+        if self.path is not None:
+            path = np.empty(len(self), dtype=object)
+            for i, p in enumerate(self.path):
+                if p is not None:
+                    # point arrays are transformed, scalars and None kept
+                    path[i] = tuple(x @ rot.T + shift if isinstance(x, np.ndarray) else x for x in p)
+        return OpTable(self.kind, self.radius, self.length,
+                       self.start @ rot.T + shift,
+                       self.direction @ rot.T,
+                       self.end @ rot.T + shift,
+                       path)
+
+    def __matmul__(self, transform: Transform) -> 'OpTable':
+        return self.transformed(transform_matrix(transform))
+
+    def to_ops(self) -> List[CNCOperation]:
+        """
+        Convert rows to the operation objects.
+        """
+        ops = []
+        for kind, r, l, start, direction, end, path in zip(
+                self.kind.tolist(), self.radius.tolist(), self.length.tolist(),
+                self.start.tolist(), self.direction.tolist(), self.end.tolist(), self.path_column()):
+            if kind == MILL:
+                ops.append(MillOp(r, l, direction=direction, start=start, end=end))
+            elif kind == PATH:
+                points, arc_mid = path
+                ops.append(PathMillOp(r, l, direction, points, arc_mid))
+            elif kind == POCKET:
+                polygon, stepover = path
+                ops.append(PocketOp(r, l, direction, polygon, stepover))
+            else:
+                ops.append(DrillOp(r, l, start=start, direction=direction))
+        return ops
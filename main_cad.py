@@ -13,6 +13,8 @@ FreeCAD notes:
 """
 
 import sys
+import contextlib
+import time
 from typing import *
 from pathlib import Path
 
@@ -29,9 +31,21 @@ if freecad_path not in sys.path:
     sys.path.append(freecad_path)
     sys.path.append(script_dir)
 
-print(sys.path)
+import build_log
+import export_writer
+log = build_log.get_logger(__name__)
+log.debug("sys.path: %s", sys.path)
 # Import FreeCAD modules
 import tool_shapes as ts
+import fittings
+import mesh_export
+import op_plan
+import scene
+import setup_plan
+import snap
+import tool_pool
+import validate
+from machine import ToolProvider
 import FreeCAD
 import Part
 #import FreeCADGui
@@ -80,6 +94,18 @@ class Shelf:
                          converter=lambda x: x if isinstance(x, tuple) else (x, x))
     placed = attrs.field(type=ts.PlacedPart, default = None)
 
+@attrs.define(eq=False)
+class FittingDrill:
+    """
+    Shelf drill function applying the registered fitting to the pannel/shelf pair.
+    """
+    wardrobe: 'Wardrobe'
+    name: str
+
+    def __call__(self, pannel: ts.PlacedPart, shelf: ts.PlacedPart, through: bool = False):
+        tool = fittings.get_fitting(self.name, through=through, **self.wardrobe.fitting_params)
+        self.wardrobe.drill_edge(pannel, shelf, tool)
+
 @attrs.define
 class Col:
     pannel: VPannel
@@ -92,19 +118,34 @@ class Col:
 
 
 
+PARTS_TABLE = 'Objednávka MAPH.ods'
+
+
+def read_parts_table(workdir: Path) -> pd.DataFrame:
+    """
+    Rows of the parts table with an identifier (column 'I').
+    """
+    df = pd.read_excel(Path(workdir) / PARTS_TABLE, engine='odf', header=None)
+    valid = df.iloc[:, ord('I') - ord('A')].notna()
+    return df[valid]
+
+
 class Wardrobe:
-    def __init__(self, workdir):
+    def __init__(self, workdir, strict: bool = True, parts_table: pd.DataFrame = None):
+        """
+        :param workdir: directory with the parts table
+        :param strict: False for a dry run collecting the problems into `self.problems`
+            instead of raising at the first one, see `validate.preflight`
+        :param parts_table: already parsed parts table, see `read_parts_table`
+        """
+        self.strict = strict
+        self.problems: List[str] = []
         self.thickness = 18
         self.shelf_width = 600
         self.draft = False #True
+        self.grid = snap.Grid(step=0.01, near=1.0)  # contact detection tolerance
 
-        # Load the ODS file
-        # Replace 'your_file.ods' with the path to your ODS file
-        df = pd.read_excel(workdir / 'Objednávka MAPH.ods', engine='odf', header=None)
-
-        # Filter rows where the 'I' column is not empty
-        valid = df.iloc[:, ord('I') - ord('A')].notna()
-        df = df[valid]
+        df = read_parts_table(workdir) if parts_table is None else parts_table
         n_parts = df.iloc[:, 0]
         identifier = df.iloc[:, ord('I') - ord('A')]
         suffix = df.iloc[:, ord('J') - ord('A')]
@@ -112,7 +153,7 @@ class Wardrobe:
         width = df.iloc[:, ord('C') - ord('A')]
         rot_ax = df.iloc[:, ord('D') - ord('A')]
         for i, s, l, w, r, n in zip(identifier, suffix, length, width, rot_ax, n_parts):
-            print("Creating part:", i)
+            log.debug("Creating part: %s", i)
             part = ts.WPart.construct(i, s, l, w, r, n, thick=self.thickness)
             setattr(self, part.name, part)
 
@@ -127,34 +168,31 @@ class Wardrobe:
 
         self.parts = [] # List of parts
         self.placed_objects: List[ts.PlacedPart] = []
-        self._pin_edge = ts.side_symmetric(ts.pin_edge(self.shelf_width))
-        self._rastex = ts.strong_edge(self.thickness, self.shelf_width, ts.rastex, through=False)
-        self._rastex_through = ts.strong_edge(self.thickness, self.shelf_width, ts.rastex, through=True)
-        self._vb_strip = ts.strong_edge(self.thickness, self.shelf_width, ts.vb, through=False)
-        self._vb_strip_through = ts.strong_edge(self.thickness, self.shelf_width, ts.vb, through=True)
-        self._rail = ts.rail()
+        # groups of the placed parts (columns), allows to move them at once
+        self.scene = scene.SceneGraph()
+        # parameters passed to the registered fittings
+        self.fitting_params = dict(thickness=self.thickness, shelf_width=self.shelf_width)
+        self._fitting_drills: Dict[str, FittingDrill] = {}
+        # placed fitting operations shared by the equal joints of this wardrobe, see `FittingTemplate.local_ops`
+        self._fitting_ops: Dict[Tuple, Tuple] = {}
         self.make_parts()
 
 
 
 
-    def drill_edge(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, tool):
+    def drill_edge(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, tool: fittings.FittingTemplate):
         # Assume panel and shelf are objects with Placement
-        tool_l, tool_r = tool
-
         if pannel.position[0] < shelf.position[0]:
             #drill_rot = FreeCAD.Rotation()
             x_shift = shelf.position[0]
-            tool_side = tool_r
+            tool_side = fittings.RIGHT
         else:
             #drill_rot = FreeCAD.Rotation(FreeCAD.Vector(0, 0, 1), 180)
             x_shift = pannel.position[0]
-            tool_side = tool_l
+            tool_side = fittings.LEFT
         common_width = pannel.part.dimensions.width
         tool_placement =  ts.translate([x_shift, common_width / 2, shelf.position[2]])
-        pannel_tool, shelf_tool = tool_side
-        pannel.apply_op(pannel_tool @ tool_placement)
-        shelf.apply_op(shelf_tool @ tool_placement)
+        tool.apply(pannel, shelf, tool_side, tool_placement, memo=self._fitting_ops)
         #
         # for z_add in [-z_dist, 0, z_dist]:
         #     for y_shift in [shelf.part.width * 0.1, shelf.part.width * 0.9]:
@@ -163,32 +201,39 @@ class Wardrobe:
         #         shelf = self.drill(shelf, tool, position, rotation=drill_rot)
         # return pannel, shelf
 
-    def drill_pins(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, through:bool = False):
-        self.drill_edge(pannel, shelf, self._pin_edge)
-
-    def drill_rastex(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, through:bool = False):
-        if through:
-            self.drill_edge(pannel, shelf, self._rastex_through)
-        else:
-            self.drill_edge(pannel, shelf, self._rastex)
-
-
-    def drill_vb_strip(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, through:bool = False):
-        if through:
-            self.drill_edge(pannel, shelf, self._vb_strip_through)
-        else:
-            self.drill_edge(pannel, shelf, self._vb_strip)
+    def fitting(self, name: str) -> Optional['FittingDrill']:
+        """
+        Shelf drill function of a registered fitting, see `fittings.register_fitting`.
+        Same function object for the same name. None in the draft mode.
+        """
+        if self.draft:
+            return None
+        fittings.fitting_def(name)
+        return self._fitting_drills.setdefault(name, FittingDrill(self, name))
 
-    def drill_rail(self, pannel:ts.PlacedPart, shelf:ts.PlacedPart, through:bool = False):
-        self. drill_edge(pannel, shelf, self._rail)
+    def fail(self, exc: Exception):
+        """
+        Raise in the strict mode, collect the problem otherwise.
+        """
+        if self.strict:
+            raise exc
+        self.problems.append(str(exc))
 
-    def add_object(self, part:ts.WPart, position) -> ts.PlacedPart:
+    def add_object(self, part:ts.WPart, position, group: int = scene.ROOT) -> ts.PlacedPart:
         if isinstance(position, FreeCAD.Vector):
             position = vec_to_list(position)
-        placed = ts.PlacedPart(part, position, name=f"{part.name}_{part.allocate()}")
+        placed = ts.PlacedPart(part, position, name=f"{part.name}_{part.allocate(strict=self.strict)}")
         self.placed_objects.append(placed)
+        self.scene.add_part(placed, parent=group)
         return placed
 
+    def move(self, group: int, transform: ts.Transform):
+        """
+        Move a scene group (column, or scene.ROOT for the whole wardrobe) with all its parts.
+        """
+        self.scene.move(group, transform)
+        self.scene.sync()
+
     # def part(self, name, form, x, y, z):
     #     position = FreeCAD.Vector(x, y, z)
     #     part = ts.PlacedPart(form, position, name=name)
@@ -206,16 +251,17 @@ class Wardrobe:
         :return: composed wardrobe body object of the parst
         """
         cross_dowel_extent = 14
-        print("Create columns")
+        log.info("Create columns")
+        # dowel joints, all placed at once at the end
+        joints: List[ts.DowelJoint] = []
 
         # bottom front
         y_shift = self.vertical_panel.dimensions.width - self.bottom.dimensions.length - self.bottom_front_L.dimensions.width
-        print("bottom_front y shift ")
         bot_front_l = self.add_object(self.bottom_front_L, [0, y_shift, 0])
         bot_front_r = self.add_object(self.bottom_front_R, [bot_front_l.part.dimensions.length, y_shift, 0] )
         # in colision with perpendicular bottom part, well conected by that
-        bot_front_l, bot_front_r = ts.dowel_connect(bot_front_l, bot_front_r, dowel_dir=0, edge_dir=1,
-                                                    rel_range=[None, (0, 0.7), None])
+        joints.append(ts.DowelJoint(bot_front_l, bot_front_r, dowel_dir=0, edge_dir=1,
+                                    rel_range=[None, (0, 0.7), None]))
 
         # ceiling
         y_shift = -100
@@ -223,8 +269,8 @@ class Wardrobe:
         ceil_a = self.add_object(self.ceil_A, [0, y_shift, z_shift])
         ceil_b = self.add_object(self.ceil_B, [ceil_a.part.dimensions.length, y_shift, z_shift])
         ceil_c = self.add_object(self.ceil_C, [ceil_a.part.dimensions.length, y_shift + 600, z_shift])
-        ceil_a, ceil_b = ts.dowel_connect(ceil_a, ceil_b, dowel_dir=0, edge_dir=1)
-        ceil_b, ceil_c = ts.dowel_connect(ceil_b, ceil_c, dowel_dir=1, edge_dir=0)
+        joints.append(ts.DowelJoint(ceil_a, ceil_b, dowel_dir=0, edge_dir=1))
+        joints.append(ts.DowelJoint(ceil_b, ceil_c, dowel_dir=1, edge_dir=0))
         #self.add_object(ts.WPart(tool, 1, 'ceil_dowel_cut'), [0, 0, 0])
 
         # front cover
@@ -232,21 +278,22 @@ class Wardrobe:
         z_shift = z_shift - self.middle_front_A.dimensions.width
         cover_a = self.add_object(self.middle_front_B, [0, y_cover, z_shift])
         cover_b = self.add_object(self.middle_front_A, [cover_a.part.dimensions.length, y_cover, z_shift])
-        cover_a, cover_b = ts.dowel_connect(cover_a, cover_b, dowel_dir=0, edge_dir=2)
-        ts.dowel_connect(cover_a, ceil_a, dowel_dir=2, edge_dir=0)
-        ts.dowel_connect(cover_a, ceil_b, dowel_dir=2, edge_dir=0)
-        ts.dowel_connect(cover_b, ceil_a, dowel_dir=2, edge_dir=0)
-        ts.dowel_connect(cover_b, ceil_b, dowel_dir=2, edge_dir=0)
+        joints.append(ts.DowelJoint(cover_a, cover_b, dowel_dir=0, edge_dir=2))
+        joints.append(ts.DowelJoint(cover_a, ceil_a, dowel_dir=2, edge_dir=0))
+        joints.append(ts.DowelJoint(cover_a, ceil_b, dowel_dir=2, edge_dir=0))
+        joints.append(ts.DowelJoint(cover_b, ceil_a, dowel_dir=2, edge_dir=0))
+        joints.append(ts.DowelJoint(cover_b, ceil_b, dowel_dir=2, edge_dir=0))
         #self.add_object(ts.WPart(tool, 1, 'front_dowel_cut'), [0, 0, 0])
 
 
         # construct cols
         x_shift = 0
-        for last, col in zip([Col.empty(), *cols], cols):
-            print(col)
+        for i_col, (last, col) in enumerate(zip([Col.empty(), *cols], cols)):
+            log.debug("%s", col)
+            col_group = self.scene.add_group(f"col_{i_col}")
             # left vertical pannel
             pannel_plank = col.pannel.part.dimensions
-            pannel_placed: ts.PlacedPart = self.add_object(col.pannel.part, [x_shift, 0, self.thickness])
+            pannel_placed: ts.PlacedPart = self.add_object(col.pannel.part, [x_shift, 0, self.thickness], group=col_group)
             # bottom
             bot_plank = col.pannel.bot_part.dimensions
             bot_part = col.pannel.bot_part
@@ -256,14 +303,14 @@ class Wardrobe:
                 align_shift = (-bot_plank.width + self.thickness) / 2
             else:
                 align_shift = -bot_plank.width + self.thickness
-            bottom: ts.PlacedPart = self.add_object(bot_part, [x_shift + align_shift, pannel_plank.width - bot_plank.length, 0])
-            bot_front_l, bottom = ts.dowel_connect(bot_front_l, bottom, dowel_dir=1, edge_dir=0)
-            bot_front_r, bottom = ts.dowel_connect(bot_front_r, bottom, dowel_dir=1, edge_dir=0)
-            bottom, pannel_placed = ts.dowel_connect(bottom, pannel_placed, dowel_dir=2, edge_dir=1, left_extent=cross_dowel_extent)
-            bot_front_l, pannel_placed = ts.dowel_connect(bot_front_l, pannel_placed, dowel_dir=2, edge_dir=1,
-                                                          rel_range = [None, [0, 0.7], None], left_extent=cross_dowel_extent)
-            bot_front_r, pannel_placed = ts.dowel_connect(bot_front_r, pannel_placed, dowel_dir=2, edge_dir=1,
-                                                          rel_range = [None, [0, 0.7], None], left_extent=cross_dowel_extent)
+            bottom: ts.PlacedPart = self.add_object(bot_part, [x_shift + align_shift, pannel_plank.width - bot_plank.length, 0], group=col_group)
+            joints.append(ts.DowelJoint(bot_front_l, bottom, dowel_dir=1, edge_dir=0))
+            joints.append(ts.DowelJoint(bot_front_r, bottom, dowel_dir=1, edge_dir=0))
+            joints.append(ts.DowelJoint(bottom, pannel_placed, dowel_dir=2, edge_dir=1, left_extent=cross_dowel_extent))
+            joints.append(ts.DowelJoint(bot_front_l, pannel_placed, dowel_dir=2, edge_dir=1,
+                                        rel_range = [None, [0, 0.7], None], left_extent=cross_dowel_extent))
+            joints.append(ts.DowelJoint(bot_front_r, pannel_placed, dowel_dir=2, edge_dir=1,
+                                        rel_range = [None, [0, 0.7], None], left_extent=cross_dowel_extent))
 
             # shelf pairs
             x_shift+= self.thickness
@@ -272,18 +319,21 @@ class Wardrobe:
             # top dowels
             # search for shelf at the top of pannel or use all ceiling parts.
             z_max = pannel_placed.aabb[1, 2]
-            top_shlef =[ (last, current)  for h, last, current in shelf_pairs if abs(h - z_max) <1e-6]
+            near_top = [h for h, _, _ in shelf_pairs if self.grid.near_miss(h, z_max)]
+            if near_top:
+                self.fail(snap.ContactError(f"{pannel_placed.name} top {z_max} near miss with shelves at {near_top}."))
+            top_shlef =[ (last, current)  for h, last, current in shelf_pairs if self.grid.equal(h, z_max)]
             if top_shlef:
                 assert len(top_shlef) == 1
                 last_shelf, shlef = top_shlef[0]
                 assert last_shelf.part == shelf.part
-                ts.dowel_connect(pannel_placed, last_shelf.placed, dowel_dir=2, edge_dir=1, left_extent=-cross_dowel_extent)
+                joints.append(ts.DowelJoint(pannel_placed, last_shelf.placed, dowel_dir=2, edge_dir=1, left_extent=-cross_dowel_extent))
             else:
                 for c in [ceil_a, ceil_b, ceil_c]:
-                    ts.dowel_connect(pannel_placed, c, dowel_dir=2, edge_dir=1, left_extent=-cross_dowel_extent)
+                    joints.append(ts.DowelJoint(pannel_placed, c, dowel_dir=2, edge_dir=1, left_extent=-cross_dowel_extent))
 
             for height, last_shelf, shelf in shelf_pairs:
-                print(f"    shelf_h: {height}")
+                log.debug("    shelf_h: %s", height)
                 shelf_flag = (last_shelf is not None, shelf is not None)
                 shelf_fn = lambda s, i : None if s is None else s.drills[i]
                 if pannel_plank.length < height:
@@ -291,27 +341,33 @@ class Wardrobe:
                     #print(f"    ...{shelf}")
                     # check matching shelf in last
                     if not shelf_flag[0] or not shelf_flag[1]:
-                        raise Exception(f"Missing continuing shelf, flag: {shelf_flag}.")
+                        self.fail(Exception(f"Missing continuing shelf at {height}, col {x_shift}, flag: {shelf_flag}."))
+                        continue
                     shelf.placed = last_shelf.placed
                 else:
                     # new shelf
                     if shelf_flag[1] and shelf.part is not None:
-                        shelf_placed = self.add_object(shelf.part, [x_shift, 0, shelf.height])
+                        shelf_placed = self.add_object(shelf.part, [x_shift, 0, shelf.height], group=col_group)
                         shelf.placed = shelf_placed
 
                     # drilling
                     last_drill = shelf_fn(last_shelf, 1)
                     act_drill = shelf_fn(shelf, 0)
                     drill_through = last_drill is act_drill
-                    if last_drill is not None:
-                        shelf_fn(last_shelf, 1)(pannel_placed, last_shelf.placed, through=drill_through)
-                    if act_drill is not None:
-                        shelf_fn(shelf, 0)(pannel_placed, shelf.placed, through=drill_through)
+                    for drill_fn, s in [(last_drill, last_shelf), (act_drill, shelf)]:
+                        if drill_fn is None:
+                            continue
+                        if s.placed is None:
+                            self.fail(Exception(f"Shelf at {height}, col {x_shift} not placed, can not drill."))
+                            continue
+                        drill_fn(pannel_placed, s.placed, through=drill_through)
 
             x_shift+= col.width
 
         total_x = x_shift
-        print("Total X dim: ", total_x)
+        build_log.event(log, "columns", total_x=total_x, dowel_joints=len(joints))
+        contact_problems = ts.dowel_connect_many(joints, grid=self.grid, strict=self.strict)
+        self.problems.extend(contact_problems)
 
         # front pannels
         y_shift = y_cover + self.thickness + 2
@@ -364,16 +420,10 @@ class Wardrobe:
             structural shells
         :return:
         """
-        if self.draft:
-            drill_vb_strip = None
-            drill_rastex = None
-            drill_pins = None
-            drill_rail = None
-        else:
-            drill_vb_strip = self.drill_vb_strip
-            drill_rastex = self.drill_rastex
-            drill_pins = self.drill_pins
-            drill_rail = self.drill_rail
+        drill_vb_strip = self.fitting("vb_strip")
+        drill_rastex = self.fitting("rastex")
+        drill_pins = self.fitting("pins")
+        drill_rail = self.fitting("rail")
 
         top_shelves = lambda fittings : (
             Shelf(1500, self.shelf_top_long, fittings),
@@ -437,33 +487,99 @@ class Wardrobe:
 
         body = self.construct_columns(columns)
 
-    def list_operations(self, fname):
+    def list_operations(self, fname, edge_drilling=True):
+        """
+        Operations of all parts grouped to the clamping setups, see `setup_plan`.
+        """
+        n_setups = 0
         with open(fname, "w") as f:
             for obj in self.placed_objects:
                 f.write(f"{obj.name}\n")
-                for op in obj.machine_ops:
-                    f.write(f"    {op}\n")
-
-
-def build_from_placed(doc, placed_parts: List[ts.PlacedPart]):
-    print("Placing components")
+                setups = setup_plan.plan_part(obj, edge_drilling)
+                n_setups += len(setups)
+                for setup in setups:
+                    f.write(f"  {setup}\n")
+                    for i, face in zip(setup.ops, setup.op_faces):
+                        f.write(f"    {setup_plan.FACE_NAMES[face]} {obj.machine_ops[i]}\n")
+        build_log.event(log, "setup_plan", parts=len(self.placed_objects), setups=n_setups)
+
+
+def build_from_placed(doc, placed_parts: List[ts.PlacedPart], max_pending: int = 4, cuts: bool = False,
+                      out_dir: Path = Path("."), tools: ToolProvider = None,
+                      mesh: mesh_export.MeshExport = None, writer: export_writer.ExportWriter = None):
+    """
+    Cut all parts, STEP files are written by a background process while the next parts are cut.
+    :param max_pending: max. number of the shapes waiting for the write
+    :param cuts: debug output of all placed tools, 'cuts compound' object and 'cuts.step'
+    :param out_dir: directory of the STEP files
+    :param tools: source of the canonical tool solids, see `tool_pool`
+    :param mesh: mesh export filled by the same cut shapes, the parts are not cut again for the GLB
+    :param writer: STEP writer kept by the caller for many builds (see `BuildContext`),
+        cleared after the build; a writer of this build only if None
+    """
+    log.info("Placing components")
+    progress = build_log.Progress(log, "build", total=len(placed_parts))
     all_cuts = []
-    all_objects = []
+    shared = writer is not None
+    if not shared:
+        writer = export_writer.ExportWriter(max_pending)
+    writer.max_pending = max_pending
+    failed = True
+    try:
+        for p in placed_parts:
+            progress.step(p.name)
+            shape, part_cuts = p.apply_machine_ops(cuts, tools)
+            obj = p.add_obj(doc, shape)
+            # Export the part to a STEP file, shape carries the feature placement
+            writer.write(obj.Shape, out_dir / f"{p.name}.step", name=p.name)
+            if mesh is not None:
+                mesh.add(p, shape=shape)
+                if cuts:
+                    mesh.add_cuts(p)
+            all_cuts.extend(part_cuts)
+        progress.done(cuts=len(all_cuts))
+        if cuts:
+            log.info("fuse cut objects")
+            #cuts_shape = ts.fuse(all_cuts)
+            cuts_shape = Part.makeCompound(all_cuts)
+            cuts_obj = doc.addObject("Part::Feature", "cuts compound")
+            cuts_obj.Shape = cuts_shape
+            writer.write(cuts_shape, name="cuts compound")
+            writer.write_assembly(["cuts compound"], out_dir / "cuts.step")
+        writer.write_assembly([p.name for p in placed_parts], out_dir / "waredrobe.step")
+        writer.flush()
+        failed = False
+    finally:
+        if shared:
+            writer.clear(cancel=failed)
+        else:
+            writer.close(cancel=failed)
+
+
+def export_mesh(placed_parts: List[ts.PlacedPart], glb_path=None, stl_dir=None, deflection=0.5, cuts=False,
+                tools: ToolProvider = None):
+    """
+    Fast viewer output, alternative to the STEP export of `build_from_placed`.
+    Distinct machined parts are cut and tessellated only once.
+    :param glb_path: single binary glTF file with shared instance meshes
+    :param stl_dir: directory for the STL files, one per placed part
+    :param deflection: tessellation tolerance [mm]
+    :param cuts: add placed tool instances for the cut visualization
+    :param tools: source of the canonical tool solids, see `tool_pool`
+    """
+    log.info("Mesh export")
+    progress = build_log.Progress(log, "mesh_export", total=len(placed_parts))
+    mesh = mesh_export.MeshExport(deflection, tools)
     for p in placed_parts:
-        print(p.name)
-        obj, cuts = p.make_obj(doc)
-        # Export the selected objects to a STEP file
-        Part.export([obj], f"{p.name}.step")
-        all_objects.append(obj)
-        all_cuts.extend(cuts)
-    print("fuse cut objects")
-    #cuts_shape = ts.fuse(all_cuts)
-    cuts_shape = Part.makeCompound(all_cuts)
-    cuts_obj = doc.addObject("Part::Feature", "cuts compound")
-    cuts_obj.Shape = cuts_shape
-    Part.export([cuts_obj], "cuts.step")
-
-    Part.export(all_objects, "waredrobe.step")
+        mesh.add(p)
+        if cuts:
+            mesh.add_cuts(p)
+        progress.step(p.name)
+    progress.done(meshes=len(mesh.meshes), instances=len(mesh.nodes))
+    if glb_path is not None:
+        mesh.write_glb(glb_path)
+    if stl_dir is not None:
+        mesh.write_stl(stl_dir)
 
 # panel1_group = doc.addObject("App::DocumentObjectGroup", "Panel1")
 # panel2_group = doc.addObject("App::DocumentObjectGroup", "Panel2")
@@ -553,25 +669,157 @@ def build_from_placed(doc, placed_parts: List[ts.PlacedPart]):
 #
 
 
-def clear_document(doc):
-    for obj in doc.Objects:
-        doc.removeObject(obj.Name)
+@attrs.define
+class BuildOptions:
+    cuts: bool = False          # cut visualization, placed tools in the GLB and in 'cuts.step'
+    glb: bool = True            # 'waredrobe.glb' mesh export
+    step: bool = True           # STEP files and the FreeCAD document
+    tool_pool: bool = True      # tool solids built in a process pool, see `tool_pool`
+    max_pending: int = 4        # max. number of shapes waiting for the STEP write
+    strict: bool = False        # raise on the first assembly problem instead of collecting them for the preflight
+
+
+@attrs.define
+class BuildResult:
+    ok: bool                    # False if the pre-flight validation failed, no geometry was built then
+    problems: List[validate.Problem]
+    files: List[Path]
+    elapsed: float
+
+
+class BuildContext:
+    """
+    Everything a wardrobe build needs: own FreeCAD document, parsed parts table and output directory.
+    A context can run any number of builds in the same process. The build state (assembly, tool pool)
+    is local to `run`, the tool pool is passed down as the tool provider.
+    The STEP export writer process is kept for all builds of the context, or it is given by the owner
+    of many contexts (`build_service`); `export_writer.ExportWriter.clear` separates the builds.
+    Shared are the process-wide caches keyed by value (canonical tools, compiled fittings),
+    so the repeated builds do not pay their construction again, and the process configuration
+    (`build_log.configure`, the `freecad.placement_transforms` benchmark switch).
+    FreeCAD itself is not thread safe, run the builds of a process one after another
+    (see `build_service`) and use more processes for parallel builds.
+    Usage:
+        with BuildContext(workdir, out_dir) as ctx:
+            result = ctx.run(BuildOptions(cuts=True))
+    """
+    def __init__(self, workdir: Path, out_dir: Path = None, name: str = "Wardrobe",
+                 writer: export_writer.ExportWriter = None):
+        """
+        :param writer: STEP writer shared with other contexts and closed by the caller,
+            the context starts and closes its own writer if None
+        """
+        self.workdir = Path(workdir)
+        self.out_dir = self.workdir if out_dir is None else Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.doc = None
+        self._parts_table: Optional[pd.DataFrame] = None
+        self._parts_mtime: Optional[float] = None
+        self._writer = writer
+        self._own_writer = writer is None
+
+    def parts_table(self) -> pd.DataFrame:
+        """
+        Parsed parts table, read again only if the file changed.
+        """
+        mtime = (self.workdir / PARTS_TABLE).stat().st_mtime
+        if self._parts_table is None or mtime != self._parts_mtime:
+            self._parts_table = read_parts_table(self.workdir)
+            self._parts_mtime = mtime
+        return self._parts_table
 
-# Ensure that FreeCAD is running with a document
-if FreeCAD.ActiveDocument is None:
-    FreeCAD.newDocument()
-else:
-    clear_document(FreeCAD.ActiveDocument)
-doc = FreeCAD.ActiveDocument  # Get the cleared (or new) document
+    def new_document(self):
+        """
+        Fresh document of the context, the previous one is closed.
+        """
+        self.close()
+        self.doc = FreeCAD.newDocument(self.name)
+        return self.doc
 
-w = Wardrobe(script_dir)
-w.list_operations("operations_list.txt")
-build_from_placed(doc, w.placed_objects)
+    def close(self):
+        if self.doc is not None:
+            FreeCAD.closeDocument(self.doc.Name)
+            self.doc = None
 
-doc.recompute()
-# Ensure all objects in the document are visible
-for obj in doc.Objects:
-    obj.Visibility = True  # Make the object visible
+    def assemble(self, strict: bool = False) -> 'Wardrobe':
+        """
+        :param strict: raise on the first assembly problem,
+            otherwise (dry run) the problems are collected for `validate.preflight`
+        """
+        return Wardrobe(self.workdir, strict=strict, parts_table=self.parts_table())
 
-path = script_dir / "Warderobe.FCStd"
-doc.saveAs(str(path))
+    def run(self, options: BuildOptions = None) -> BuildResult:
+        """
+        Assembly, validation, operation lists and plan, mesh export and the STEP/FreeCAD output.
+        :return: result, not 'ok' if the validation fails
+        """
+        options = BuildOptions() if options is None else options
+        t_start = time.perf_counter()
+        out = self.out_dir
+        w = self.assemble(options.strict)
+        t_preflight = time.perf_counter()
+        problems = validate.preflight(w)
+        if not validate.report(problems, time.perf_counter() - t_preflight):
+            return BuildResult(False, problems, [], time.perf_counter() - t_start)
+        files = [out / "operations_list.txt", out / "operation_plan"]
+        w.list_operations(files[0])
+        # replayable assembly result, see `op_plan.OpPlan.load`
+        op_plan.OpPlan.from_placed(w.placed_objects).save(files[1])
+        # tool solids not built yet in this process are built in parallel, while the first parts are cut
+        keys = tool_pool.collect_tool_keys(w.placed_objects) if options.tool_pool else []
+        pool = tool_pool.ToolPrecompute(keys) if keys else contextlib.nullcontext()
+        with pool:
+            tools = pool.get if keys else None
+            glb_path = out / "waredrobe.glb"
+            if options.glb:
+                files.append(glb_path)
+                if not options.step:
+                    export_mesh(w.placed_objects, glb_path=glb_path, cuts=options.cuts, tools=tools)
+            if options.step:
+                # the GLB meshes are tessellated from the shapes cut for the STEP files
+                mesh = mesh_export.MeshExport(tools=tools) if options.glb else None
+                doc = self.new_document()
+                if self._writer is None:
+                    self._writer = export_writer.ExportWriter(options.max_pending)
+                build_from_placed(doc, w.placed_objects, options.max_pending, cuts=options.cuts, out_dir=out,
+                                  tools=tools, mesh=mesh, writer=self._writer)
+                if mesh is not None:
+                    mesh.write_glb(glb_path)
+                files.extend(out / f"{p.name}.step" for p in w.placed_objects)
+                files.append(out / "waredrobe.step")
+                if options.cuts:
+                    files.append(out / "cuts.step")
+                doc.recompute()
+                # Ensure all objects in the document are visible
+                for obj in doc.Objects:
+                    obj.Visibility = True  # Make the object visible
+                files.append(out / "Warderobe.FCStd")
+                doc.saveAs(str(files[-1]))
+        elapsed = time.perf_counter() - t_start
+        build_log.event(log, "build_done", files=len(files), elapsed=round(elapsed, 3))
+        return BuildResult(True, problems, files, elapsed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        if self._own_writer and self._writer is not None:
+            self._writer.close(cancel=exc_type is not None)
+            self._writer = None
+
+
+def main():
+    # --quiet: warnings and errors only, the JSON event stream has all INFO records
+    # --cuts: cut visualization, placed tools in the GLB and in 'cuts.step'
+    # --strict: stop at the first assembly problem
+    build_log.configure(quiet="--quiet" in sys.argv, json_path=script_dir / "build_events.jsonl")
+    with BuildContext(script_dir) as ctx:
+        result = ctx.run(BuildOptions(cuts="--cuts" in sys.argv, strict="--strict" in sys.argv))
+    if not result.ok:
+        raise SystemExit("Pre-flight validation failed.")
+
+
+if __name__ == "__main__":
+    main()
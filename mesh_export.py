@@ -0,0 +1,199 @@
+"""
+Export of machined parts as triangle meshes: single binary glTF (GLB) or a set of STL files.
+
+Meant for fast visualization of the wardrobe, the STEP export is slow to write
+and heavy to open. Every distinct machined part (same WPart, same local machine ops)
+is cut and tessellated just once, all its placed instances share the single mesh.
+"""
+from typing import *
+import json
+import struct
+from pathlib import Path
+import numpy as np
+
+import FreeCAD
+import Part
+from machine import ToolProvider, canonical_tool
+
+
+def tessellate(shape: Part.Shape, deflection: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Triangulate the shape.
+    :param shape:
+    :param deflection: max. distance of the mesh from the true surface [mm]
+    :return: vertices (N, 3) float32, triangles (M, 3) uint32
+    """
+    points, triangles = shape.tessellate(deflection)
+    verts = np.array([(p.x, p.y, p.z) for p in points], dtype=np.float32).reshape(-1, 3)
+    tris = np.array(triangles, dtype=np.uint32).reshape(-1, 3)
+    return verts, tris
+
+
+def instance_key(placed: 'PlacedPart'):
+    """
+    Placed parts with equal key have the same machined shape in the local coordinates.
+    """
+    return id(placed.part), tuple(repr(op) for op in placed.machine_ops)
+
+
+def placement_matrix(placement: FreeCAD.Placement) -> np.ndarray:
+    """
+    Placement as 4x4 numpy matrix acting on column vectors.
+    """
+    return np.array(placement.toMatrix().A, dtype=float).reshape(4, 4)
+
+
+class MeshExport:
+    """
+    Collects placed parts, tessellates every distinct machined part once.
+    Usage:
+        mesh = MeshExport(deflection=0.5)
+        for p in placed_parts:
+            mesh.add(p)
+        mesh.write_glb("waredrobe.glb")
+    """
+    def __init__(self, deflection: float = 0.5, tools: ToolProvider = None):
+        """
+        :param tools: source of the canonical tool solids, see `machine.canonical_tool`
+        """
+        self.deflection = deflection
+        self.tools = tools
+        # (name, vertices, triangles)
+        self.meshes: List[Tuple[str, np.ndarray, np.ndarray]] = []
+        # (name, mesh index, placement)
+        self.nodes: List[Tuple[str, int, FreeCAD.Placement]] = []
+        self._mesh_idx: Dict[Any, int] = {}
+
+    def add(self, placed: 'PlacedPart', shape: Part.Shape = None):
+        """
+        Add a placed part instance.
+        :param placed:
+        :param shape: already machined shape in part local coordinates,
+            the machine ops are applied if not given and no equal instance was added before.
+        """
+        key = instance_key(placed)
+        i_mesh = self._mesh_idx.get(key, None)
+        if i_mesh is None:
+            if shape is None:
+                shape, _ = placed.apply_machine_ops(tools=self.tools)
+            verts, tris = tessellate(shape, self.deflection)
+            i_mesh = len(self.meshes)
+            self.meshes.append((placed.name, verts, tris))
+            self._mesh_idx[key] = i_mesh
+        self.nodes.append((placed.name, i_mesh, placed.placement.placement))
+
+    def _mesh(self, key, name: str, shape_fn: Callable[[], Part.Shape]) -> int:
+        i_mesh = self._mesh_idx.get(key, None)
+        if i_mesh is None:
+            verts, tris = tessellate(shape_fn(), self.deflection)
+            i_mesh = len(self.meshes)
+            self.meshes.append((name, verts, tris))
+            self._mesh_idx[key] = i_mesh
+        return i_mesh
+
+    def add_cuts(self, placed: 'PlacedPart'):
+        """
+        Add the tools of the part operations, for the cut visualization.
+        Canonical tool solids are tessellated once per tool key, operations are just the placed instances.
+        Tools without a canonical solid (path mills, pockets) are tessellated per operation.
+        """
+        for i, op in enumerate(placed.machine_ops):
+            name = f"{placed.name}_cut_{i}"
+            key = op.tool_key
+            if key is None:
+                i_mesh = self._mesh(('op', id(op)), name, lambda: op.tool_shape)
+                placement = placed.placement.placement
+            else:
+                i_mesh = self._mesh(('tool', key), "_".join(map(str, key)), lambda: canonical_tool(key, self.tools))
+                placement = (op.tool_transform @ placed.placement).placement
+            self.nodes.append((name, i_mesh, placement))
+
+    def write_glb(self, path: Union[str, Path]):
+        """
+        Write single binary glTF file, meshes shared by the instance nodes.
+        Coordinates converted from mm to m.
+        """
+        bin_chunks = []
+        offset = 0
+        buffer_views = []
+        accessors = []
+        gltf_meshes = []
+
+        def add_view(data: bytes, target):
+            nonlocal offset
+            buffer_views.append(dict(buffer=0, byteOffset=offset, byteLength=len(data), target=target))
+            pad = (-len(data)) % 4
+            bin_chunks.append(data + b'\0' * pad)
+            offset += len(data) + pad
+            return len(buffer_views) - 1
+
+        ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+        FLOAT, UNSIGNED_INT = 5126, 5125
+        for name, verts, tris in self.meshes:
+            i_pos = add_view(verts.astype('<f4').tobytes(), ARRAY_BUFFER)
+            accessors.append(dict(bufferView=i_pos, componentType=FLOAT, count=len(verts), type="VEC3",
+                                  min=verts.min(axis=0).tolist(), max=verts.max(axis=0).tolist()))
+            i_idx = add_view(tris.astype('<u4').tobytes(), ELEMENT_ARRAY_BUFFER)
+            accessors.append(dict(bufferView=i_idx, componentType=UNSIGNED_INT, count=tris.size, type="SCALAR"))
+            gltf_meshes.append(dict(name=name, primitives=[
+                dict(attributes=dict(POSITION=len(accessors) - 2), indices=len(accessors) - 1, mode=4)]))
+
+        nodes = []
+        for name, i_mesh, placement in self.nodes:
+            base = placement.Base
+            nodes.append(dict(name=name, mesh=i_mesh,
+                              translation=[base.x, base.y, base.z],
+                              rotation=list(placement.Rotation.Q)))
+        root = dict(name="wardrobe", scale=[0.001, 0.001, 0.001], children=list(range(len(nodes))))
+        nodes.append(root)
+
+        gltf = dict(
+            asset=dict(version="2.0", generator="masif"),
+            scene=0,
+            scenes=[dict(nodes=[len(nodes) - 1])],
+            nodes=nodes,
+            meshes=gltf_meshes,
+            accessors=accessors,
+            bufferViews=buffer_views,
+            buffers=[dict(byteLength=offset)],
+        )
+        json_data = json.dumps(gltf, separators=(',', ':')).encode()
+        json_data += b' ' * ((-len(json_data)) % 4)
+        bin_data = b''.join(bin_chunks)
+        total = 12 + 8 + len(json_data) + 8 + len(bin_data)
+        with open(path, "wb") as f:
+            f.write(struct.pack('<III', 0x46546C67, 2, total))
+            f.write(struct.pack('<II', len(json_data), 0x4E4F534A))
+            f.write(json_data)
+            f.write(struct.pack('<II', len(bin_data), 0x004E4942))
+            f.write(bin_data)
+
+    def write_stl(self, out_dir: Union[str, Path]):
+        """
+        Write binary STL file for every placed part, in global coordinates [mm].
+        """
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        for name, i_mesh, placement in self.nodes:
+            _, verts, tris = self.meshes[i_mesh]
+            mat = placement_matrix(placement)
+            placed_verts = verts @ mat[:3, :3].T + mat[:3, 3]
+            write_stl(out_dir / f"{name}.stl", placed_verts, tris, name)
+
+
+def write_stl(path: Union[str, Path], verts: np.ndarray, tris: np.ndarray, name: str = ""):
+    """
+    Binary STL of a triangle mesh.
+    """
+    corners = verts[tris]   # (M, 3, 3)
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    norm = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, norm, out=np.zeros_like(normals), where=norm > 0)
+    records = np.zeros(len(tris), dtype=[('normal', '<f4', 3), ('corners', '<f4', (3, 3)), ('attr', '<u2')])
+    records['normal'] = normals
+    records['corners'] = corners
+    header = name.encode()[:80].ljust(80, b' ')
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(struct.pack('<I', len(tris)))
+        f.write(records.tobytes())
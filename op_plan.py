@@ -0,0 +1,151 @@
+"""
+Operation plan: result of the assembly stage saved for the CNC handoff and for caching.
+
+Directory format:
+    plan.json           version, part records (name, part name, plank dimensions, placement, op range),
+                        path data of the PATH and POCKET rows
+    ops_<column>.npy    flat `OpTable` columns of all parts, rows of part i are offsets[i]:offsets[i+1]
+    shape_<i>.brep      shapes of the parts without plank dimensions (drawers, boxes), listed in plan.json
+
+Columns are loaded memory-mapped, so a saved plan can be replayed into cutting, G-code
+or mesh export without running `Wardrobe` again:
+
+    OpPlan.from_placed(wardrobe.placed_objects).save("operation_plan")
+    placed_parts = OpPlan.load("operation_plan").to_placed()
+"""
+from typing import *
+import json
+from pathlib import Path
+import attrs
+import numpy as np
+
+import Part
+import tool_shapes as ts
+from machine import OpTable, transform_matrix, matrix_transform, PATH, POCKET
+
+VERSION = 1
+COLUMNS = ('kind', 'radius', 'length', 'start', 'direction', 'end')
+
+
+def dimensions_dict(plank: Optional[ts.PlankPart]) -> Optional[Dict[str, Any]]:
+    if plank is None:
+        return None
+    return dict(length=plank.length, width=plank.width, thick=plank.thick, rot=list(plank.rot))
+
+
+def plank_from_dict(d: Dict[str, Any]) -> ts.PlankPart:
+    return ts.PlankPart(d['length'], d['width'], d['rot'], d['thick'])
+
+
+def path_to_json(p: Tuple) -> List:
+    return [x.tolist() if isinstance(x, np.ndarray) else x for x in p]
+
+
+def path_from_json(p: List) -> Tuple:
+    return tuple(np.array(x, dtype=float) if isinstance(x, list) else x for x in p)
+
+
+@attrs.define
+class PartRecord:
+    name: str           # placed part name
+    part: str           # WPart name
+    n_parts: int
+    dimensions: Optional[Dict[str, Any]]    # PlankPart data, None for other parts (drawers)
+    placement: np.ndarray                   # (4, 4)
+
+
+@attrs.define
+class OpPlan:
+    parts: List[PartRecord]
+    offsets: np.ndarray     # (n_parts + 1,) row ranges of the parts in the table
+    table: OpTable          # operations in the part local coordinates
+    shapes: Dict[str, Part.Shape] = attrs.field(factory=dict)   # shapes of the non-plank parts by the part name
+
+    @classmethod
+    def from_placed(cls, placed_parts: List[ts.PlacedPart]) -> 'OpPlan':
+        records, tables, shapes = [], [], {}
+        for p in placed_parts:
+            if p.part.dimensions is None:
+                shapes[p.part.name] = p.part.shape
+            records.append(PartRecord(p.name, p.part.name, p.part.n_parts,
+                                      dimensions_dict(p.part.dimensions), transform_matrix(p.placement)))
+            tables.append(OpTable.from_ops(p.machine_ops))
+        offsets = np.concatenate([[0], np.cumsum([len(t) for t in tables])])
+        return cls(records, offsets, OpTable.concat(tables), shapes)
+
+    def __len__(self):
+        return len(self.parts)
+
+    def part_table(self, i: int) -> OpTable:
+        return self.table[self.offsets[i]:self.offsets[i + 1]]
+
+    def save(self, directory: Path):
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for col in COLUMNS:
+            np.save(directory / f"ops_{col}.npy", np.ascontiguousarray(getattr(self.table, col)))
+        paths = {}
+        if self.table.path is not None:
+            for i in np.flatnonzero((self.table.kind == PATH) | (self.table.kind == POCKET)):
+                paths[str(i)] = path_to_json(self.table.path[i])
+        shape_files = {}
+        for i, (name, shape) in enumerate(self.shapes.items()):
+            shape_files[name] = f"shape_{i}.brep"
+            shape.exportBrep(str(directory / shape_files[name]))
+        data = dict(
+            version=VERSION,
+            parts=[dict(name=r.name, part=r.part, n_parts=r.n_parts, dimensions=r.dimensions,
+                        placement=r.placement.tolist()) for r in self.parts],
+            offsets=self.offsets.tolist(),
+            paths=paths,
+            shapes=shape_files)
+        with open(directory / "plan.json", "w") as f:
+            json.dump(data, f)
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> 'OpPlan':
+        """
+        :param mmap: op columns memory-mapped read only, otherwise read into memory
+        """
+        directory = Path(directory)
+        with open(directory / "plan.json") as f:
+            data = json.load(f)
+        assert data['version'] == VERSION, f"Unsupported plan version: {data['version']}"
+        mmap_mode = 'r' if mmap else None
+        columns = [np.load(directory / f"ops_{col}.npy", mmap_mode=mmap_mode) for col in COLUMNS]
+        path = None
+        if data['paths']:
+            path = np.full(len(columns[0]), None, dtype=object)
+            for i, p in data['paths'].items():
+                path[int(i)] = path_from_json(p)
+        records = [PartRecord(r['name'], r['part'], r['n_parts'], r['dimensions'], np.array(r['placement']))
+                   for r in data['parts']]
+        shapes = {}
+        for name, file in data.get('shapes', {}).items():
+            shape = Part.Shape()
+            shape.importBrep(str(directory / file))
+            shapes[name] = shape
+        return cls(records, np.array(data['offsets']), OpTable(*columns, path), shapes)
+
+    def to_placed(self, shapes: Dict[str, Part.Shape] = None) -> List[ts.PlacedPart]:
+        """
+        Recreate the placed parts with their operations.
+        :param shapes: part shapes by the part name, override the shapes saved with the plan
+        """
+        shapes = {**self.shapes, **(shapes or {})}
+        parts: Dict[str, ts.WPart] = {}
+        placed_parts = []
+        for i, r in enumerate(self.parts):
+            part = parts.get(r.part, None)
+            if part is None:
+                if r.dimensions is None:
+                    part = ts.WPart(shapes[r.part], r.n_parts, r.part)
+                else:
+                    plank = plank_from_dict(r.dimensions)
+                    part = ts.WPart(plank.shape(), r.n_parts, r.part, dimensions=plank)
+                parts[r.part] = part
+            rotation = matrix_transform(r.placement).placement.Rotation
+            placed = ts.PlacedPart(part, r.placement[:3, 3].tolist(), name=r.name, rotation=rotation)
+            placed.machine_ops.extend(self.part_table(i).to_ops())
+            placed_parts.append(placed)
+        return placed_parts
@@ -0,0 +1,188 @@
+"""
+Append-only, memory-mapped store of machine operations for large batch jobs.
+
+Directory layout:
+    <column>.bin    raw binary column of the `OpTable` field, rows appended part by part
+    paths.jsonl     path data of the PATH and POCKET rows (row, data), one line per row
+    index.jsonl     per-part offset index, one line {"key", "begin", "end", "paths_end"} per appended part
+
+The store is a standalone utility for batch jobs over saved operations (many wardrobes, G-code
+generation), the build itself keeps the operations in `PlacedPart.machine_ops`.
+There is a single writer, any number of readers. Only the parts in the index are visible,
+data of an append interrupted by a crash is cut off by the next append.
+
+Readers memory-map the column files and get zero-copy row ranges of a part. Workers of a process pool get just the store directory and
+the part key, no operation data is pickled or duplicated between the processes:
+
+    store = OpStore(directory)
+    for p in placed_parts:
+        store.append(f"order_1/{p.name}", OpTable.from_ops(p.machine_ops))
+    results = map_parts(directory, count_drills, processes=8)
+"""
+from typing import *
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+from machine import OpTable, PATH, POCKET
+
+# column: (dtype, row width)
+COLUMNS = dict(
+    kind=(np.int64, 1),
+    radius=(np.float64, 1),
+    length=(np.float64, 1),
+    start=(np.float64, 3),
+    direction=(np.float64, 3),
+    end=(np.float64, 3))
+
+
+class OpStore:
+    def __init__(self, directory: Path):
+        """
+        Open existing store or create an empty one.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.index: Dict[str, Tuple[int, int]] = {}
+        self.n_rows = 0
+        # committed sizes of the index and of the paths file
+        self._index_size = 0
+        self._paths_size = 0
+        index_path = self.directory / "index.jsonl"
+        if index_path.exists():
+            with open(index_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break       # incomplete line of an interrupted append
+                    rec = json.loads(line)
+                    self.index[rec['key']] = (rec['begin'], rec['end'])
+                    self.n_rows = max(self.n_rows, rec['end'])
+                    self._paths_size = rec['paths_end']
+                    self._index_size += len(line)
+        self._columns = None
+        self._paths = None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key: str):
+        return key in self.index
+
+    def keys(self) -> List[str]:
+        return list(self.index)
+
+    def _truncate_uncommitted(self):
+        """
+        Cut off the files to the indexed data, removes leftovers of an interrupted append.
+        """
+        sizes = {f"{col}.bin": self.n_rows * width * np.dtype(dtype).itemsize
+                 for col, (dtype, width) in COLUMNS.items()}
+        sizes["paths.jsonl"] = self._paths_size
+        sizes["index.jsonl"] = self._index_size
+        for name, size in sizes.items():
+            path = self.directory / name
+            if path.exists() and path.stat().st_size > size:
+                os.truncate(path, size)
+
+    def append(self, key: str, table: OpTable):
+        """
+        Append operations of a single part, 'key' must be unique within the store.
+        The index line is written last, the part is visible only if complete.
+        """
+        if key in self.index:
+            raise KeyError(f"Part already stored: {key}")
+        self._truncate_uncommitted()
+        begin, end = self.n_rows, self.n_rows + len(table)
+        for col, (dtype, width) in COLUMNS.items():
+            data = np.ascontiguousarray(getattr(table, col), dtype=dtype)
+            with open(self.directory / f"{col}.bin", "ab") as f:
+                f.write(data.tobytes())
+        paths_end = self._paths_size
+        if table.path is not None:
+            with open(self.directory / "paths.jsonl", "ab") as f:
+                for i in np.flatnonzero((table.kind == PATH) | (table.kind == POCKET)):
+                    data = [x.tolist() if isinstance(x, np.ndarray) else x for x in table.path[i]]
+                    f.write((json.dumps(dict(row=begin + int(i), data=data)) + "\n").encode())
+                paths_end = f.tell()
+        line = (json.dumps(dict(key=key, begin=begin, end=end, paths_end=paths_end)) + "\n").encode()
+        with open(self.directory / "index.jsonl", "ab") as f:
+            f.write(line)
+        self.index[key] = (begin, end)
+        self.n_rows = end
+        self._paths_size = paths_end
+        self._index_size += len(line)
+        self._columns = None
+        self._paths = None
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """
+        Read only memory maps of all columns, shared by the operating system page cache.
+        """
+        if self._columns is None:
+            self._columns = {}
+            for col, (dtype, width) in COLUMNS.items():
+                shape = (self.n_rows,) if width == 1 else (self.n_rows, width)
+                if self.n_rows == 0:
+                    self._columns[col] = np.empty(shape, dtype=dtype)
+                else:
+                    self._columns[col] = np.memmap(self.directory / f"{col}.bin", dtype=dtype,
+                                                   mode='r', shape=shape)
+        return self._columns
+
+    def paths(self) -> Dict[int, Tuple]:
+        if self._paths is None:
+            self._paths = {}
+            paths_file = self.directory / "paths.jsonl"
+            if paths_file.exists():
+                # committed part only
+                with open(paths_file, "rb") as f:
+                    for line in f.read(self._paths_size).splitlines():
+                        rec = json.loads(line)
+                        self._paths[rec['row']] = tuple(np.array(x, dtype=float) if isinstance(x, list) else x
+                                                        for x in rec['data'])
+        return self._paths
+
+    def part_table(self, key: str) -> OpTable:
+        """
+        Operations of the part, columns are views into the memory maps.
+        """
+        begin, end = self.index[key]
+        cols = self.columns()
+        path = None
+        paths = self.paths()
+        rows = [i for i in range(begin, end) if i in paths] if paths else []
+        if rows:
+            path = np.full(end - begin, None, dtype=object)
+            for i in rows:
+                path[i - begin] = paths[i]
+        return OpTable(*[cols[col][begin:end] for col in COLUMNS], path)
+
+
+# Worker process state: the store opened once by `_open_store`.
+_store: Optional['OpStore'] = None
+
+
+def _open_store(directory: str):
+    global _store
+    _store = OpStore(directory)
+
+
+def _part_worker(args):
+    key, fn = args
+    return fn(key, _store.part_table(key))
+
+
+def map_parts(directory: Path, fn: Callable[[str, OpTable], Any], keys: List[str] = None,
+              processes: int = None) -> Dict[str, Any]:
+    """
+    Call fn(key, table) for the parts in a process pool, every worker maps the store once at its start.
+    :param fn: module level function (picklable)
+    :param keys: default are all parts
+    """
+    if keys is None:
+        keys = OpStore(directory).keys()
+    with ProcessPoolExecutor(processes, initializer=_open_store, initargs=(str(directory),)) as executor:
+        results = executor.map(_part_worker, [(key, fn) for key in keys])
+        return dict(zip(keys, results))
@@ -0,0 +1,126 @@
+"""
+Lightweight scene graph of the placed parts.
+
+Nodes are groups or placed parts, every node has a local 4x4 transform relative to its parent.
+All matrices are kept in arrays, world matrices and part AABBs of the dirty nodes are recomputed
+level by level in vectorized steps. Moving a group (column, whole wardrobe) is a single
+matrix product per level, no geometry is rebuilt. Machine operations are stored in the part
+local coordinates, so these remain valid when the parts move.
+
+Usage:
+    scene = SceneGraph()
+    col = scene.add_group("col_0")
+    scene.add_part(placed, parent=col)
+    scene.move(col, translate([100, 0, 0]))
+    scene.sync()        # update world placements of the PlacedParts
+"""
+from typing import *
+import numpy as np
+
+import FreeCAD
+import tool_shapes as ts
+from machine import Transform, transform_matrix, matrix_transform
+
+ROOT = 0
+
+
+class SceneGraph:
+    def __init__(self):
+        self.names: List[str] = ["root"]
+        self.parent = np.array([-1])
+        self.depth = np.array([0])
+        self.local = np.eye(4)[None, :, :]
+        self.world = np.eye(4)[None, :, :]
+        self.dirty = np.array([False])
+        # part nodes
+        self.parts: List[ts.PlacedPart] = []
+        self.part_node = np.empty(0, dtype=int)
+        self.part_corners = np.empty((0, 8, 4))      # corners of the part shape bounding box
+        self.part_aabb = np.empty((0, 2, 3))         # world AABBs
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add_node(self, name: str, parent: int, local: np.ndarray) -> int:
+        assert 0 <= parent < len(self), f"Invalid parent node: {parent}"
+        node = len(self.names)
+        self.names.append(name)
+        self.parent = np.append(self.parent, parent)
+        self.depth = np.append(self.depth, self.depth[parent] + 1)
+        self.local = np.concatenate([self.local, local[None]])
+        self.world = np.concatenate([self.world, (self.world[parent] @ local)[None]])
+        self.dirty = np.append(self.dirty, True)
+        return node
+
+    def add_group(self, name: str, transform: Transform = None, parent: int = ROOT) -> int:
+        """
+        :return: node index of the new group
+        """
+        local = np.eye(4) if transform is None else transform_matrix(transform)
+        return self._add_node(name, parent, local)
+
+    def add_part(self, placed: ts.PlacedPart, parent: int = ROOT) -> int:
+        """
+        Add placed part, its current placement is taken relative to the parent world placement.
+        """
+        world = transform_matrix(placed.placement)
+        local = np.linalg.inv(self.world[parent]) @ world
+        node = self._add_node(placed.name, parent, local)
+        self.parts.append(placed)
+        self.part_node = np.append(self.part_node, node)
+        corners = ts.box_corners(placed.part.box)
+        self.part_corners = np.concatenate([self.part_corners, corners[None]])
+        self.part_aabb = np.concatenate([self.part_aabb, np.zeros((1, 2, 3))])
+        return node
+
+    def subtree(self, node: int) -> np.ndarray:
+        """
+        Bool mask of the node and all its descendants.
+        Children are always added after the parent, so a single pass in index order is enough.
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        mask[node] = True
+        for i in range(node + 1, len(self)):
+            mask[i] = mask[self.parent[i]]
+        return mask
+
+    def move(self, node: int, transform: Transform):
+        """
+        Apply 'transform' to the node after its current local transform (in the parent coordinates).
+        """
+        self.local[node] = transform_matrix(transform) @ self.local[node]
+        self.dirty[node] = True
+
+    def set_transform(self, node: int, transform: Transform):
+        self.local[node] = transform_matrix(transform)
+        self.dirty[node] = True
+
+    def update(self) -> np.ndarray:
+        """
+        Recompute world matrices and part AABBs of the dirty subtrees.
+        :return: indices of the updated parts
+        """
+        if self.dirty[ROOT]:
+            self.world[ROOT] = self.local[ROOT]
+        for d in range(1, int(np.max(self.depth)) + 1):
+            level = np.flatnonzero(self.depth == d)
+            # dirty flag propagates from parent to children
+            self.dirty[level] |= self.dirty[self.parent[level]]
+            level = level[self.dirty[level]]
+            if len(level):
+                self.world[level] = self.world[self.parent[level]] @ self.local[level]
+        updated = np.flatnonzero(self.dirty[self.part_node])
+        if len(updated):
+            mats = self.world[self.part_node[updated]]
+            corners = np.einsum('pij,pkj->pki', mats, self.part_corners[updated])[..., :3]
+            self.part_aabb[updated, 0] = np.min(corners, axis=1)
+            self.part_aabb[updated, 1] = np.max(corners, axis=1)
+        self.dirty[:] = False
+        return updated
+
+    def sync(self):
+        """
+        Update and push world placements to the modified PlacedParts.
+        """
+        for i in self.update():
+            self.parts[i].set_world(matrix_transform(self.world[self.part_node[i]]))
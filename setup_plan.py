@@ -0,0 +1,138 @@
+"""
+Machine-side plan of the part operations: grouping by the entry face and the clamping setups.
+
+Every operation enters the part through the face opposite to its dominant tool direction
+(part local coordinates, drilling in -Z enters the +Z face). A setup is a part clamped
+with one face up, it reaches the up face and with the horizontal drilling units also the four edge faces.
+The minimal number of setups covering all used faces is found by a search over the face subsets.
+Within a setup operations are grouped by the tool and ordered by the nearest neighbour walk
+to shorten the moves.
+
+Usage:
+    for setup in plan_part(placed):
+        print(setup, [placed.machine_ops[i] for i in setup.ops])
+"""
+from typing import *
+import itertools
+import attrs
+import numpy as np
+
+import tool_shapes as ts
+from machine import OpTable
+
+FACE_NAMES = ("-X", "+X", "-Y", "+Y", "-Z", "+Z")
+N_FACES = 6
+
+
+def entry_faces(direction: np.ndarray) -> np.ndarray:
+    """
+    Face index (2 * axis + positive side) through which the tool of given 'direction' (N, 3) enters.
+    """
+    axis = np.argmax(np.abs(direction), axis=1)
+    d = direction[np.arange(len(direction)), axis]
+    return 2 * axis + (d < 0)
+
+
+def reachable(up_face: int, edge_drilling: bool) -> np.ndarray:
+    """
+    Bool mask of the faces machined in the setup with 'up_face' up.
+    """
+    mask = np.zeros(N_FACES, dtype=bool)
+    mask[up_face] = True
+    if edge_drilling:
+        axis = up_face // 2
+        mask[[f for f in range(N_FACES) if f // 2 != axis]] = True
+    return mask
+
+
+def min_setups(face_counts: np.ndarray, edge_drilling: bool = True) -> List[int]:
+    """
+    Minimal set of up faces covering all used faces.
+    From the minimal sets the one with most operations on the up faces is chosen.
+    :param face_counts: (6,) number of operations per entry face
+    """
+    used = face_counts > 0
+    if not np.any(used):
+        return []
+    candidates = [f for f in range(N_FACES)]
+    for n in range(1, N_FACES + 1):
+        covers = [c for c in itertools.combinations(candidates, n)
+                  if np.all(np.any([reachable(f, edge_drilling) for f in c], axis=0) | ~used)]
+        if covers:
+            return list(max(covers, key=lambda c: (face_counts[list(c)].sum(), -sum(c))))
+    raise AssertionError("All faces covered by six setups.")
+
+
+def nearest_order(points: np.ndarray, start: np.ndarray) -> np.ndarray:
+    """
+    Greedy nearest neighbour walk through the points beginning closest to 'start'.
+    """
+    n = len(points)
+    dist = np.linalg.norm(points[:, None, :] - points[None, :, :], axis=2)
+    visited = np.zeros(n, dtype=bool)
+    current_dist = np.linalg.norm(points - start, axis=1)
+    order = []
+    for k in range(n):
+        i = int(np.argmin(np.where(visited, np.inf, current_dist)))
+        order.append(i)
+        visited[i] = True
+        current_dist = dist[i]
+    return np.array(order, dtype=int)
+
+
+@attrs.define
+class Setup:
+    up_face: int
+    faces: Tuple[int, ...]     # entry faces of the setup operations
+    ops: np.ndarray            # indices of the part machine_ops in the machining order
+    op_faces: np.ndarray       # entry faces of 'ops'
+
+    @property
+    def name(self):
+        return f"{FACE_NAMES[self.up_face]} up"
+
+    def __str__(self):
+        faces = ", ".join(FACE_NAMES[f] for f in self.faces)
+        return f"setup {self.name}: {len(self.ops)} ops, faces {faces}"
+
+
+def plan_table(table: OpTable, edge_drilling: bool = True) -> List[Setup]:
+    """
+    Setups and the operation order for the operation table of a single part (local coordinates).
+    :param edge_drilling: the machine has the horizontal units drilling into the edge faces
+    """
+    if len(table) == 0:
+        return []
+    faces = entry_faces(table.direction)
+    counts = np.bincount(faces, minlength=N_FACES)
+    up_faces = min_setups(counts, edge_drilling)
+    # assign ops to the setup with their face up if possible, to the first reaching setup otherwise
+    assign = np.full(len(table), -1)
+    for i_setup, f in reversed(list(enumerate(up_faces))):
+        assign[reachable(f, edge_drilling)[faces]] = i_setup
+    for i_setup, f in enumerate(up_faces):
+        assign[faces == f] = i_setup
+
+    tool = np.stack([table.kind, table.radius, table.length], axis=1)
+    setups = []
+    for i_setup, f in enumerate(up_faces):
+        idx = np.flatnonzero(assign == i_setup)
+        if len(idx) == 0:
+            continue
+        ordered = []
+        position = np.zeros(3)
+        # group by face and tool, nearest neighbour walk in every group
+        group_keys = np.concatenate([faces[idx, None], tool[idx]], axis=1)
+        groups, group_of = np.unique(group_keys, axis=0, return_inverse=True)
+        for i_group in range(len(groups)):
+            g_idx = idx[group_of.reshape(-1) == i_group]
+            g_idx = g_idx[nearest_order(table.start[g_idx], position)]
+            position = table.start[g_idx[-1]]
+            ordered.append(g_idx)
+        ordered = np.concatenate(ordered)
+        setups.append(Setup(f, tuple(np.unique(faces[idx]).tolist()), ordered, faces[ordered]))
+    return setups
+
+
+def plan_part(placed: ts.PlacedPart, edge_drilling: bool = True) -> List[Setup]:
+    return plan_table(OpTable.from_ops(placed.machine_ops), edge_drilling)
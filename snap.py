@@ -0,0 +1,50 @@
+"""
+Snapping of the placed part coordinates to a grid and tolerant contact detection.
+
+Coordinates of the placed parts carry float noise from the rotations in `PlankPart.shape`
+and from the translations. Coordinates are quantized to integer multiples of the grid step,
+contacts are then detected by integer comparisons. Distances that are not a contact
+but are close to it are reported as near misses.
+"""
+from typing import *
+import attrs
+import numpy as np
+
+
+class ContactError(Exception):
+    """
+    Parts expected to be in contact are not touching within the grid tolerance.
+    """
+
+
+@attrs.define(frozen=True)
+class Grid:
+    step: float = 0.01      # grid step [mm]
+    near: float = 1.0       # larger distances are not reported as near misses [mm]
+
+    def index(self, x) -> np.ndarray:
+        """
+        Integer grid coordinates.
+        """
+        return np.rint(np.asarray(x, dtype=float) / self.step).astype(np.int64)
+
+    def snap(self, x) -> np.ndarray:
+        """
+        Coordinates snapped to the grid.
+        """
+        return self.index(x) * self.step
+
+    def equal(self, a, b) -> np.ndarray:
+        """
+        Coordinates equal up to single grid step.
+        """
+        return np.abs(self.index(a) - self.index(b)) <= 1
+
+    def near_miss(self, a, b) -> np.ndarray:
+        """
+        Coordinates not equal, but closer then 'near'.
+        """
+        return ~self.equal(a, b) & (np.abs(np.asarray(a, dtype=float) - b) <= self.near)
+
+
+DEFAULT_GRID = Grid()
@@ -0,0 +1,33 @@
+import json
+import logging
+
+import build_log
+
+
+class Counted:
+    n_repr = 0
+
+    def __repr__(self):
+        Counted.n_repr += 1
+        return "counted"
+
+
+def test_json_events(tmp_path):
+    path = tmp_path / "events.jsonl"
+    build_log.configure(quiet=True, json_path=path)
+    log = build_log.get_logger("test")
+    # lazy formatting, no repr below the level
+    log.debug("apply %r", Counted())
+    assert Counted.n_repr == 0
+
+    progress = build_log.Progress(log, "cut", total=3, every=2)
+    for name in ["a", "b", "c"]:
+        progress.step(name)
+    progress.done(cuts=5)
+    build_log.configure(logging.WARNING)
+
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert records[0]["message"].startswith("cut 2/3,")
+    last = records[-1]
+    assert last["event"] == "cut" and last["count"] == 3 and last["cuts"] == 5
+    assert Counted.n_repr == 0
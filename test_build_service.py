@@ -0,0 +1,85 @@
+import asyncio
+from pathlib import Path
+import pytest
+
+import build_log
+import build_service
+import main_cad
+
+log = build_log.get_logger(__name__)
+
+
+class StubContext:
+    """
+    BuildContext without the geometry, emits the build events of two parts.
+    """
+    instances = []
+
+    def __init__(self, workdir, out_dir=None, writer=None):
+        self.workdir = workdir
+        self.out_dir = out_dir
+        self.writer = writer
+        self.runs = []
+        self.n_closed = 0
+        StubContext.instances.append(self)
+
+    def run(self, options):
+        self.runs.append(options)
+        progress = build_log.Progress(log, "build", total=2)
+        progress.step("a")
+        progress.step("b")
+        progress.done()
+        return main_cad.BuildResult(True, [], [self.out_dir / "waredrobe.glb"], 0.5)
+
+    def close(self):
+        self.n_closed += 1
+
+
+def test_make_job():
+    service = build_service.BuildService()
+    job = service.make_job(dict(workdir="/work", options=dict(cuts=True, step=False)))
+    assert job.workdir == Path("/work") and job.out_dir == Path("/work")
+    assert job.options == main_cad.BuildOptions(cuts=True, step=False)
+    with pytest.raises(TypeError):
+        service.make_job(dict(options=dict(no_such_option=1)))
+
+
+class StubWriter:
+    def __init__(self):
+        self.closed = False
+
+    def close(self, cancel=False):
+        self.closed = True
+
+
+def test_service_events(tmp_path, monkeypatch):
+    monkeypatch.setattr(main_cad, "BuildContext", StubContext)
+    monkeypatch.setattr(build_service.export_writer, "ExportWriter", StubWriter)
+    StubContext.instances = []
+    socket = tmp_path / "build.sock"
+    request = dict(workdir=str(tmp_path), out_dir=str(tmp_path / "out"), options=dict(cuts=True))
+
+    service = build_service.BuildService()
+
+    async def session():
+        server = asyncio.create_task(service.serve(socket))
+        while not socket.exists():
+            await asyncio.sleep(0.01)
+        events = [msg async for msg in build_service.submit(request, socket)]
+        invalid = [msg async for msg in build_service.submit(dict(options=dict(no_such_option=1)), socket)]
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+        return events, invalid
+
+    events, invalid = asyncio.run(session())
+    assert [msg["event"] for msg in events] == ["queued", "build_step", "build_step", "build", "done"]
+    assert events[-1]["files"] == [str(tmp_path / "out" / "waredrobe.glb")]
+    assert [msg["event"] for msg in invalid] == ["failed"]
+    assert invalid[0]["error"].startswith("Invalid request")
+    ctx, = StubContext.instances
+    assert ctx.runs == [main_cad.BuildOptions(cuts=True)]
+    # document closed after the build
+    assert ctx.n_closed >= 1
+    # writer shared by the contexts, closed with the service
+    assert ctx.writer is service.writer and service.writer.closed
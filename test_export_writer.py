@@ -0,0 +1,67 @@
+import pytest
+import Part
+
+from export_writer import ExportWriter
+
+
+def test_export_writer(tmp_path):
+    with ExportWriter(max_pending=2) as writer:
+        for i in range(5):
+            writer.write(Part.makeBox(10, 20, 30 + i), tmp_path / f"box_{i}.step", name=f"box_{i}")
+        writer.write_assembly([f"box_{i}" for i in range(5)], tmp_path / "boxes.step")
+    assert writer.n_files == 6
+    assert all((tmp_path / f"box_{i}.step").stat().st_size > 0 for i in range(5))
+    assert Part.read(str(tmp_path / "boxes.step")).Volume == pytest.approx(sum(10 * 20 * (30 + i) for i in range(5)))
+
+
+def test_export_writer_clear(tmp_path):
+    # two builds on the same worker process, each with its own shape names
+    with ExportWriter() as writer:
+        writer.write(Part.makeBox(10, 10, 10), name="a")
+        writer.write_assembly(["a"], tmp_path / "first.step")
+        writer.flush()
+        writer.clear()
+        assert writer.n_files == 0
+        writer.write(Part.makeBox(20, 20, 20), tmp_path / "b.step", name="b")
+        writer.write_assembly(["a"], tmp_path / "second.step")
+        with pytest.raises(KeyError):
+            writer.flush()
+        writer.clear()
+        writer.write_assembly(["b"], tmp_path / "third.step")
+    assert writer.n_files == 1
+    assert Part.read(str(tmp_path / "third.step")).Volume == pytest.approx(8000)
+    assert not (tmp_path / "second.step").exists()
+
+
+class FailingShape:
+    def exportBrepToString(self):
+        raise IOError("disk full")
+
+
+def test_export_writer_error(tmp_path):
+    with pytest.raises(IOError):
+        with ExportWriter() as writer:
+            writer.write(FailingShape(), tmp_path / "fail.step")
+            writer.write(Part.makeBox(1, 1, 1), tmp_path / "skipped.step")
+    assert not (tmp_path / "skipped.step").exists()
+
+
+def test_export_writer_worker_error(tmp_path):
+    # the export fails in the worker process: directory of the file does not exist
+    writer = ExportWriter(max_pending=1)
+    try:
+        writer.write(Part.makeBox(1, 1, 1), tmp_path / "no_dir" / "fail.step")
+        # surfaces at the next write, which waits for the failed one
+        with pytest.raises(Exception):
+            writer.write(Part.makeBox(2, 2, 2), tmp_path / "skipped.step")
+        # and is kept for the flush
+        with pytest.raises(Exception):
+            writer.flush()
+    finally:
+        writer.close()
+    assert not (tmp_path / "skipped.step").exists()
+
+    with pytest.raises(Exception):
+        with ExportWriter(max_pending=4) as writer:
+            writer.write(Part.makeBox(1, 1, 1), tmp_path / "no_dir" / "fail.step")
+    assert writer.n_files == 0
@@ -0,0 +1,27 @@
+import Part
+
+import tool_shapes as ts
+import fingerprint
+from machine import DrillOp
+
+
+def test_fingerprint_compare(tmp_path):
+    plank = ts.WPart(Part.makeBox(18, 400, 100), 3, 'plank')
+    parts = [ts.PlacedPart(plank, [i * 100, 0, 0], name=f"plank_{i}") for i in range(3)]
+    ops = [DrillOp(4, 10, start=[0, 50, 50], direction=[1, 0, 0]),
+           DrillOp(4, 10, start=[0, 150, 50], direction=[1, 0, 0])]
+    for p in parts:
+        p.machine_ops.extend(ops)
+    ref = fingerprint.fingerprints(parts)
+    # same operations in other order, equal up to the grid
+    parts[1].machine_ops.reverse()
+    parts[2].machine_ops[0] = DrillOp(4, 10, start=[0, 50 + 1e-4, 50], direction=[1, 0, 0])
+    assert fingerprint.compare(ref, fingerprint.fingerprints(parts)) == []
+
+    fingerprint.save(ref, tmp_path / "fp.json")
+    assert fingerprint.load(tmp_path / "fp.json") == ref
+    parts[0].machine_ops.pop()
+    diffs = fingerprint.compare(ref, fingerprint.fingerprints(parts[:2]))
+    assert diffs[0] == "plank_2: missing"
+    assert any(d.startswith("plank_0: volume") for d in diffs)
+    assert any(d.startswith("plank_0: ops_hash") for d in diffs)
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import Part
+import tool_shapes as ts
+from machine import OpTable
+import fittings
+
+thickness = 18
+
+
+def placed_pair():
+    pannel = ts.PlacedPart(ts.WPart(Part.makeBox(thickness, 600, 2000), 1, 'pannel'), [100, 0, 18], name='pannel')
+    shelf = ts.PlacedPart(ts.WPart(Part.makeBox(400, 600, thickness), 1, 'shelf'), [118, 0, 500], name='shelf')
+    return pannel, shelf
+
+
+@pytest.mark.parametrize("tool", [
+    ts.side_symmetric(ts.pin_edge(600)),
+    ts.strong_edge(thickness, 600, ts.rastex),
+    ts.strong_edge(thickness, 600, ts.vb, through=True),
+    ts.rail(),
+])
+def test_template_matches_tree(tool):
+    template = fittings.FittingTemplate.compile(tool)
+    transform = ts.translate([118, 300, 500])
+    for side, (pannel_tool, shelf_tool) in zip([fittings.LEFT, fittings.RIGHT], tool):
+        ref_pannel, ref_shelf = placed_pair()
+        ref_pannel.apply_op(pannel_tool @ transform)
+        ref_shelf.apply_op(shelf_tool @ transform)
+        pannel, shelf = placed_pair()
+        template.apply(pannel, shelf, side, transform)
+        for ref, part in [(ref_pannel, pannel), (ref_shelf, shelf)]:
+            ref_table, table = OpTable.from_ops(ref.machine_ops), OpTable.from_ops(part.machine_ops)
+            assert len(ref_table) == len(table)
+            for field in ['kind', 'radius', 'length', 'start', 'direction', 'end']:
+                assert np.allclose(getattr(ref_table, field), getattr(table, field))
+
+
+def test_apply_memo():
+    template = fittings.FittingTemplate.compile(ts.strong_edge(thickness, 600, ts.rastex))
+    first, second = placed_pair(), placed_pair()
+    memo = {}
+    for pannel, shelf in [first, second]:
+        template.apply(pannel, shelf, fittings.RIGHT, ts.translate([118, 300, 500]), memo=memo)
+    assert len(memo) == 2
+    # equal joints share the immutable operations
+    assert all(a is b for a, b in zip(first[0].machine_ops, second[0].machine_ops))
+
+
+def test_registry(monkeypatch):
+    # registrations of the test end with it
+    monkeypatch.setattr(fittings, "_registry", dict(fittings._registry))
+    assert fittings.get_fitting("rastex") is fittings.get_fitting("rastex", thickness=18, unused=1)
+    assert fittings.get_fitting("rastex", through=True) is not fittings.get_fitting("rastex")
+
+    @fittings.register_fitting("test_pin", pin_l=7)
+    def test_pin(pin_l):
+        pannel_op = ts.DrillOp(2.5, pin_l, direction=[-1, 0, 0])
+        return ts.side_symmetric(ts.OperationList(pannel_op, ts.NoneOp()))
+
+    template = fittings.get_fitting("test_pin", pin_l=10)
+    pannel_table, shelf_table = template.sides[fittings.RIGHT]
+    assert len(pannel_table) == 1 and len(shelf_table) == 0
+    assert pannel_table.length[0] == 10
+    with pytest.raises(KeyError):
+        fittings.get_fitting("no_such_fitting")
+    # dimensions of the registered fittings are parameters
+    pins = fittings.get_fitting("pins", z_step=32).sides[fittings.RIGHT][0]
+    assert sorted(set(np.round(pins.start[:, 2] - 7.5 / 2, 6))) == [-32, 0, 32]
+    strip = fittings.get_fitting("vb_strip", dowel_y=(0,)).sides[fittings.RIGHT][0]
+    assert len(strip) == 3
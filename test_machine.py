@@ -1,6 +1,9 @@
 from freecad import *
 
-from machine import DrillOp, MillOp,  OperationList
+import attrs
+import numpy as np
+import pytest
+from machine import DrillOp, MillOp, NoneOp, OperationList, matrix_key, transform_matrix, PathMillOp, PocketOp, OpTable, MILL, slot_tool_shape, lofted_mill_tool_shape
 #from tool_shapes import rotate, translate
 
 def test_drill_op():
@@ -13,6 +16,30 @@ def test_drill_op():
     assert drill1 == drill2
 
 
+def test_op_records():
+    drill = DrillOp(2, 3, start=[1, 0.1 + 0.2, 0])
+    assert drill.start == (1.0, 0.3, 0.0)
+    assert len({drill, DrillOp(2.0, 3.0, start=(1, 0.3, 0)), DrillOp(2, 4)}) == 2
+    with pytest.raises(attrs.exceptions.FrozenInstanceError):
+        drill.radius = 3
+    assert not hasattr(drill, "__dict__")
+
+
+def test_op_hash():
+    a = OperationList(DrillOp(2, 3), OperationList(DrillOp(3, 4), NoneOp()))
+    b = OperationList(DrillOp(2, 3), OperationList(DrillOp(3, 4), NoneOp()))
+    assert a == b and hash(a) == hash(b)
+    assert a != OperationList(DrillOp(2, 3))
+    # same transform composed differently
+    t1 = rotate([0, 0, 1], 90) @ translate([1, 0, 0])
+    t2 = rotate([0, 0, 1], 45) @ rotate([0, 0, 1], 45) @ translate([0.3, 0, 0]) @ translate([0.7, 0, 0])
+    assert t1 == t2 and hash(t1) == hash(t2)
+    assert matrix_key(transform_matrix(t1)) == t1.key()
+    memo = {(a, t1): 1}
+    assert memo[(b, t2)] == 1
+    assert a @ t1 == b @ t2
+
+
 def shape_doc(op):
     doc = FreeCAD.newDocument()
     shapes = [o.tool_shape for o in op.expand()]
@@ -55,3 +82,91 @@ def test_operation_list():
         print(cca, '&',  ccb)
 
 
+
+
+@pytest.mark.parametrize("radius, length, x_end", [(3.75, 10.5, 7.5), (22, 1.0, 600), (2.5, 5, 0)])
+def test_slot_tool_volume(radius, length, x_end):
+    slot = slot_tool_shape(radius, length, x_end)
+    assert slot.isValid()
+    exact = np.pi * radius ** 2 * length + 2 * radius * x_end * length
+    assert slot.Volume == pytest.approx(exact, rel=1e-6)
+    if x_end > 0:
+        lofted = lofted_mill_tool_shape(radius, length, x_end, 0)
+        assert slot.Volume == pytest.approx(lofted.Volume, rel=1e-6)
+
+
+def test_mill_tool_shape():
+    op = MillOp(3, 5, direction=[1, 0, 0], start=[0, 0, -3], end=[0, 0, 3])
+    shape = op.tool_shape
+    assert shape.Volume == pytest.approx(np.pi * 9 * 5 + 2 * 3 * 6 * 5, rel=1e-6)
+    bb = shape.BoundBox
+    assert (bb.XMin, bb.XMax) == pytest.approx((0, 5))
+    assert (bb.ZMin, bb.ZMax) == pytest.approx((-6, 6))
+
+
+def test_mill_op_table():
+    op = MillOp(3, 5, direction=[1, 0, 0], start=[0, 100, 20], end=[0, 300, 20])
+    assert op.copy() is op and op.expand() == [op]
+    table = OpTable.from_ops([op, op @ translate([0, 0, 10])])
+    assert table.kind.tolist() == [MILL, MILL]
+    moved = table.to_ops()
+    assert moved[0] == op
+    assert moved[1] == MillOp(3, 5, direction=[1, 0, 0], start=[0, 100, 30], end=[0, 300, 30])
+
+
+def test_path_mill_op():
+    # L-shaped path with a quarter circle corner, radius 10
+    points = [[0, 0, 0], [50, 0, 0], [60, 10, 0], [60, 50, 0]]
+    arc_mid = [[np.nan] * 3, [50 + 10 * np.sin(np.pi / 4), 10 - 10 * np.cos(np.pi / 4), 0], [np.nan] * 3]
+    op = PathMillOp(3, 5, [0, 0, 1], points, arc_mid)
+    path = op.toolpath(tolerance=0.01)
+    assert np.allclose(path[0], points[0]) and np.allclose(path[-1], points[-1])
+    on_arc = (path[:, 0] > 50) & (path[:, 1] < 10)
+    assert np.allclose(np.linalg.norm(path[on_arc] - [50, 10, 0], axis=1), 10)
+
+    # single swept solid: area of the offset path times the tool length
+    shape = op.tool_shape
+    assert len(shape.Solids) == 1
+    path_len = 50 + np.pi / 2 * 10 + 40
+    area = path_len * 2 * 3 + np.pi * 3 ** 2
+    assert shape.Volume == pytest.approx(area * 5, rel=1e-3)
+
+    # table round trip with a transform
+    transform = rotate([0, 0, 1], [1, 0, 0]) @ translate([1, 2, 3])
+    table = OpTable.from_ops([op, DrillOp(2, 3)]) @ transform
+    moved = table.to_ops()
+    ref = op @ transform
+    assert np.allclose(moved[0].points, ref.points)
+    assert np.allclose(moved[0].arc_mid, ref.arc_mid, equal_nan=True)
+    assert moved[1] == DrillOp(2, 3) @ transform
+
+
+def test_path_mill_straight():
+    # collinear path, no plane for the offset, same solid as the single slot
+    op = PathMillOp(3, 5, [0, 0, 1], [[20, 0, 0], [0, 0, 0], [50, 0, 0]])
+    shape = op.tool_shape
+    assert shape.Volume == pytest.approx(np.pi * 9 * 5 + 2 * 3 * 50 * 5, rel=1e-6)
+    bb = shape.BoundBox
+    assert (bb.XMin, bb.XMax, bb.ZMin, bb.ZMax) == pytest.approx((-3, 53, 0, 5))
+    two_points = PathMillOp(3, 5, [0, 0, 1], [[0, 0, 0], [50, 0, 0]])
+    assert two_points.tool_shape.Volume == pytest.approx(shape.Volume, rel=1e-6)
+
+
+def test_pocket_op():
+    # 100 x 40 rectangle pocket, depth 8, cutting downwards from z=18
+    polygon = [[0, 0, 18], [100, 0, 18], [100, 40, 18], [0, 40, 18]]
+    pocket = PocketOp(5, 8, [0, 0, -1], polygon, stepover=10)
+    assert pocket.tool_shape.Volume == pytest.approx(100 * 40 * 8)
+    path = pocket.toolpath()
+    # 4 passes, tool keeps radius distance from the walls
+    assert path.shape == (8, 3)
+    assert np.allclose(path[:, 2], 10)
+    assert np.min(path[:, 0]) == pytest.approx(5) and np.max(path[:, 0]) == pytest.approx(95)
+    # passes by increasing Y, frame e1, e2 = +X, +Y seen from the tool side
+    assert np.allclose(path[:, 1], [5, 5, 15, 15, 25, 25, 35, 35])
+    # zig-zag: alternate pass directions
+    assert np.allclose(path[1::2, 0] - path[0::2, 0], [90, -90, 90, -90])
+
+    transform = rotate([0, 0, 1], [1, 0, 0]) @ translate([1, 2, 3])
+    moved = (OpTable.from_ops([pocket]) @ transform).to_ops()[0]
+    assert np.allclose(moved.toolpath(), (pocket @ transform).toolpath())
@@ -0,0 +1,69 @@
+import os
+import shutil
+import pytest
+
+import FreeCAD
+import main_cad
+import mesh_export
+import tool_shapes as ts
+import validate
+from machine import DrillOp
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    workdir = tmp_path / "work"
+    workdir.mkdir()
+    shutil.copy(main_cad.script_dir / main_cad.PARTS_TABLE, workdir)
+    return workdir
+
+
+def test_read_parts_table(workdir):
+    df = main_cad.read_parts_table(workdir)
+    assert len(df) > 0
+    assert df.iloc[:, ord('I') - ord('A')].notna().all()
+
+
+def test_build_context(workdir, tmp_path):
+    out_dir = tmp_path / "out"
+    with main_cad.BuildContext(workdir, out_dir) as ctx:
+        table = ctx.parts_table()
+        # parsed again only if the file changes
+        assert ctx.parts_table() is table
+        os.utime(workdir / main_cad.PARTS_TABLE, (1, 1))
+        assert ctx.parts_table() is not table
+        result = ctx.run(main_cad.BuildOptions(glb=False, step=False, tool_pool=False))
+    assert result.ok
+    assert result.files == [out_dir / "operations_list.txt", out_dir / "operation_plan"]
+    assert all(f.exists() for f in result.files)
+    assert ctx.doc is None
+
+
+def test_build_context_failed_preflight(workdir, tmp_path, monkeypatch):
+    problem = validate.Problem(validate.ERROR, "pannel_1", "test problem")
+    monkeypatch.setattr(validate, "preflight", lambda w: [problem])
+    result = main_cad.BuildContext(workdir, tmp_path / "out").run(main_cad.BuildOptions(tool_pool=False))
+    assert not result.ok
+    assert result.problems == [problem] and result.files == []
+    assert not (tmp_path / "out" / "operations_list.txt").exists()
+
+
+def test_build_from_placed_mesh(tmp_path, monkeypatch):
+    plank = ts.WPart.construct('plank', None, 400, 100, 'Y', 2, thick=18)
+    parts = [ts.PlacedPart(plank, [0, 0, 0], name='plank_1'), ts.PlacedPart(plank, [100, 0, 0], name='plank_2')]
+    for p in parts:
+        p.machine_ops.append(DrillOp(4, 10, start=[0, 50, 50], direction=[1, 0, 0]))
+    n_cuts = []
+    apply_machine_ops = ts.PlacedPart.apply_machine_ops
+    monkeypatch.setattr(ts.PlacedPart, "apply_machine_ops",
+                        lambda self, *args: n_cuts.append(self.name) or apply_machine_ops(self, *args))
+    mesh = mesh_export.MeshExport()
+    doc = FreeCAD.newDocument("test_build")
+    try:
+        main_cad.build_from_placed(doc, parts, out_dir=tmp_path, mesh=mesh)
+    finally:
+        FreeCAD.closeDocument(doc.Name)
+    # every part cut once, for the STEP file and the mesh together
+    assert n_cuts == ['plank_1', 'plank_2']
+    assert len(mesh.meshes) == 1 and len(mesh.nodes) == 2
+    assert (tmp_path / "waredrobe.step").exists()
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import Part
+
+import tool_shapes as ts
+from machine import DrillOp, PathMillOp, PocketOp, rotate, translate
+from op_plan import OpPlan
+
+
+def placed_parts():
+    plank = ts.WPart.construct('plank', None, 400, 100, 'Y', 2, thick=18)
+    box = ts.WPart(Part.makeBox(50, 50, 50), 1, 'box')
+    a = ts.PlacedPart(plank, [0, 0, 0], name='plank_1')
+    b = ts.PlacedPart(plank, [100, 0, 0], name='plank_2')
+    c = ts.PlacedPart(box, [0, 500, 0], name='box_1')
+    a.machine_ops.extend([DrillOp(4, 10, start=[0, 50, 50], direction=[1, 0, 0]),
+                          PathMillOp(3, 5, [1, 0, 0], [[0, 10, 10], [0, 40, 10], [0, 40, 40]])])
+    c.machine_ops.append(PocketOp(5, 8, [0, 0, -1], [[0, 0, 50], [20, 0, 50], [20, 20, 50]], stepover=4))
+    transform = rotate([0, 0, 1], 90) @ translate([0, 0, 20])
+    c.set_world(transform)
+    return [a, b, c], box
+
+
+def test_plan_round_trip(tmp_path):
+    parts, box = placed_parts()
+    OpPlan.from_placed(parts).save(tmp_path)
+    plan = OpPlan.load(tmp_path)
+    assert isinstance(plan.table.start, np.memmap)
+    # the box shape saved with the plan
+    loaded = plan.to_placed()
+    assert [p.name for p in loaded] == ['plank_1', 'plank_2', 'box_1']
+    assert loaded[0].part is loaded[1].part
+    for orig, new in zip(parts, loaded):
+        assert np.allclose(orig.aabb, new.aabb)
+        assert [repr(op) for op in orig.machine_ops] == [repr(op) for op in new.machine_ops]
+    assert loaded[2].machine_ops[0].stepover == 4
+    assert loaded[2].part.shape.Volume == pytest.approx(box.shape.Volume)
+    assert list(plan.shapes) == ['box']
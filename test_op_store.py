@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from machine import OpTable, DrillOp, PocketOp, DRILL
+from op_store import OpStore, map_parts
+
+
+def count_drills(key, table):
+    return int(np.sum(table.kind == DRILL))
+
+
+def test_op_store(tmp_path):
+    store = OpStore(tmp_path)
+    a = OpTable.drills(4, 10, [[0, 50, 50], [0, 80, 50]], [1, 0, 0])
+    b = OpTable.from_ops([DrillOp(2, 3),
+                          PocketOp(5, 8, [0, 0, -1], [[0, 0, 50], [20, 0, 50], [20, 20, 50]])])
+    store.append("w1/a", a)
+    store.append("w1/b", b)
+    store.append("w1/empty", OpTable.empty())
+    with pytest.raises(KeyError):
+        store.append("w1/a", a)
+
+    # reopen
+    store = OpStore(tmp_path)
+    assert store.keys() == ["w1/a", "w1/b", "w1/empty"]
+    table_a = store.part_table("w1/a")
+    assert isinstance(table_a.start, np.memmap)
+    assert np.allclose(table_a.start, a.start)
+    ops_b = store.part_table("w1/b").to_ops()
+    assert ops_b[0] == DrillOp(2, 3)
+    assert np.allclose(ops_b[1].polygon, b.path[1][0])
+    assert len(store.part_table("w1/empty")) == 0
+
+    assert map_parts(tmp_path, count_drills, processes=2) == {"w1/a": 2, "w1/b": 1, "w1/empty": 0}
+
+
+def test_op_store_interrupted_append(tmp_path):
+    store = OpStore(tmp_path)
+    a = OpTable.drills(4, 10, [[0, 50, 50], [0, 80, 50]], [1, 0, 0])
+    pocket = OpTable.from_ops([PocketOp(5, 8, [0, 0, -1], [[0, 0, 50], [20, 0, 50], [20, 20, 50]])])
+    store.append("a", a)
+    # crash after the column and path data, before the index line was completed
+    for name in ["kind.bin", "start.bin"]:
+        with open(tmp_path / name, "ab") as f:
+            f.write(b"\0" * 24)
+    with open(tmp_path / "paths.jsonl", "a") as f:
+        f.write('{"row": 2, "data": [')
+    with open(tmp_path / "index.jsonl", "a") as f:
+        f.write('{"key": "lost", "begin"')
+
+    store = OpStore(tmp_path)
+    assert store.keys() == ["a"]
+    store.append("b", pocket)
+    store = OpStore(tmp_path)
+    assert store.keys() == ["a", "b"]
+    assert np.allclose(store.part_table("a").start, a.start)
+    table_b = store.part_table("b")
+    assert np.allclose(table_b.start, pocket.start)
+    assert np.allclose(table_b.to_ops()[0].polygon, pocket.path[0][0])
@@ -0,0 +1,52 @@
+import numpy as np
+import Part
+
+import tool_shapes as ts
+import scene
+from machine import DrillOp, transform_matrix
+
+
+def test_scene_move_group():
+    plank = ts.WPart(Part.makeBox(18, 400, 100), 3, 'plank')
+    graph = scene.SceneGraph()
+    col = graph.add_group("col")
+    a = ts.PlacedPart(plank, [0, 0, 0], name='a')
+    b = ts.PlacedPart(plank, [100, 0, 0], name='b')
+    c = ts.PlacedPart(plank, [500, 0, 0], name='c')
+    for p in [a, b]:
+        graph.add_part(p, parent=col)
+    graph.add_part(c)
+    assert list(graph.update()) == [0, 1, 2]
+    a.apply_op(DrillOp(4, 10, start=[0, 50, 50], direction=[1, 0, 0]))
+    local_ops = list(a.machine_ops)
+
+    graph.move(col, ts.translate([10, 20, 30]))
+    assert list(graph.update()) == [0, 1]
+    graph.move(col, ts.rotate([0, 0, 1], 90))
+    graph.sync()
+    # rotation applied after the translation, around the origin
+    assert np.allclose(b.position, [-20, 110, 30])
+    assert np.allclose(b.aabb, ts.aabb((plank.shape @ b.placement).BoundBox))
+    assert np.allclose(b.aabb, [[-420, 110, 30], [-20, 128, 130]])
+    assert np.allclose(c.aabb, [[500, 0, 0], [518, 400, 100]])
+    # operations stay in the part coordinates
+    assert a.machine_ops == local_ops
+
+
+def test_scene_move_root():
+    plank = ts.WPart(Part.makeBox(18, 400, 100), 2, 'plank')
+    graph = scene.SceneGraph()
+    col = graph.add_group("col")
+    a = ts.PlacedPart(plank, [100, 0, 0], name='a')
+    b = ts.PlacedPart(plank, [0, 0, 0], name='b')
+    graph.add_part(a, parent=col)
+    graph.add_part(b)
+    graph.sync()
+    graph.move(scene.ROOT, ts.rotate([0, 0, 1], 90) @ ts.translate([0, 0, 10]))
+    assert list(graph.update()) == [0, 1]
+    graph.move(scene.ROOT, ts.translate([0, 0, 10]))
+    graph.sync()
+    assert np.allclose(a.position, [0, 100, 20])
+    assert np.allclose(b.aabb, [[-400, 0, 20], [0, 18, 120]])
+    # rotation is kept by the part, placement is built from it
+    assert np.allclose(transform_matrix(a.placement)[:3, :3], [[0, -1, 0], [1, 0, 0], [0, 0, 1]])
@@ -0,0 +1,23 @@
+import numpy as np
+
+import setup_plan as sp
+from machine import OpTable
+
+
+def test_setup_plan():
+    direction = np.array([[0, 0, -1], [0, 0, -1], [1, 0, 0], [0, 0, 1], [0, -1, 0], [0, 0, -1]], dtype=float)
+    start = np.array([[10, 10, 18], [100, 10, 18], [0, 50, 9], [20, 20, 0], [30, 400, 9], [50, 10, 18]],
+                     dtype=float)
+    table = OpTable.drills([2.5, 2.5, 4, 2.5, 4, 2.5], 10, start, direction)
+    assert list(sp.entry_faces(direction)) == [5, 5, 0, 4, 3, 5]
+
+    # with edge drilling a single setup clamped on the -X edge reaches all faces
+    setups = sp.plan_table(table)
+    assert len(setups) == 1
+    assert sorted(setups[0].ops) == list(range(6))
+
+    # top faces only: one setup per face, ops on a face ordered by nearest neighbour from the origin
+    setups = sp.plan_table(table, edge_drilling=False)
+    assert [s.name for s in setups] == ["-X up", "+Y up", "-Z up", "+Z up"]
+    assert list(setups[-1].ops) == [0, 5, 1]
+    assert all(np.all(s.op_faces == s.up_face) for s in setups)
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+import snap
+
+
+def test_grid():
+    grid = snap.Grid(step=0.01, near=1.0)
+    assert grid.index(18.0000000001) == 1800
+    assert grid.snap(17.99999999) == pytest.approx(18.0)
+    assert grid.equal(100.0, 100.0 + 1e-9)
+    assert grid.equal(100.004, 100.006)
+    assert not grid.equal(100.0, 100.5)
+    assert grid.near_miss(100.0, 100.5)
+    assert not grid.near_miss(100.0, 118.0)
+    assert list(grid.equal(np.array([0.0, 1.0]), np.array([1e-8, 2.0]))) == [True, False]
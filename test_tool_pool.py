@@ -0,0 +1,32 @@
+import pytest
+import Part
+
+import tool_shapes as ts
+import machine
+import tool_pool
+from machine import DrillOp, MillOp, PocketOp
+
+
+def test_tool_precompute():
+    plank = ts.WPart(Part.makeBox(18, 400, 100), 1, 'plank')
+    placed = ts.PlacedPart(plank, [0, 0, 0], name='plank')
+    placed.machine_ops.extend([
+        DrillOp(4, 10, start=[0, 50, 50], direction=[1, 0, 0]),
+        DrillOp(4, 10, start=[0, 80, 50], direction=[1, 0, 0]),
+        MillOp(3, 5, direction=[1, 0, 0], start=[0, 100, 20], end=[0, 300, 20]),
+        PocketOp(3, 5, [1, 0, 0], [[0, 10, 10], [0, 40, 10], [0, 40, 40], [0, 10, 40]]),
+    ])
+    machine.clear_tool_cache()
+    keys = tool_pool.collect_tool_keys([placed])
+    assert keys == [('drill', 4.0, 10.0), placed.machine_ops[2].tool_key]
+
+    with tool_pool.ToolPrecompute(keys, processes=2) as pool:
+        for key in keys:
+            shape = machine.canonical_tool(key, pool.get)
+            assert shape.Volume == pytest.approx(machine.build_tool(key).Volume)
+        assert pool.get(('drill', 1.0, 1.0)) is None
+        shape, cuts = placed.apply_machine_ops(tools=pool.get)
+    # built tools are not submitted again
+    assert tool_pool.collect_tool_keys([placed]) == []
+    machine.clear_tool_cache()
+    assert shape.Volume < plank.shape.Volume
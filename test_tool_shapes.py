@@ -34,18 +34,20 @@ def make_scene(tool_shape, name):
     else:
         tool_l = tool_shape.copy() @ ts.rotate([0, 0, 1], 180)
         tool_r = tool_shape
+    scene = ts.DrillScene()
     # right side cut
     cut_pos = [0, shelf_width/2, z_shelf_pos]
-    pannel_f = ts.drill(pannel_f, tool_r, cut_pos)
-    shelf_r_f = ts.drill(shelf_r_f, tool_r, cut_pos)
+    pannel_f = scene.drill(pannel_f, tool_r, cut_pos)
+    shelf_r_f = scene.drill(shelf_r_f, tool_r, cut_pos)
     cut_r_feature = doc.addObject('Part::Feature', 'cut_tool_r')
     cut_r_feature.Shape = tool_r
     cut_r_feature.Placement = FreeCAD.Placement(FreeCAD.Vector(cut_pos), FreeCAD.Rotation())
 
     # left side cut
     cut_pos = [-thickness, shelf_width/2, z_shelf_pos]
-    pannel_f = ts.drill(pannel_f, tool_l, cut_pos)
-    shelf_l_f = ts.drill(shelf_l_f, tool_l, cut_pos)
+    pannel_f = scene.drill(pannel_f, tool_l, cut_pos)
+    shelf_l_f = scene.drill(shelf_l_f, tool_l, cut_pos)
+    scene.finalize()
     cut_l_feature = doc.addObject('Part::Feature', 'cut_tool_l')
     cut_l_feature.Shape = tool_l
 
@@ -230,3 +232,73 @@ def test_cut2():
     path = script_dir / "test_cut.step"
     #all_objects = doc.Objects  # This returns all objects in the document
     Part.export(features, str(path))
+
+
+def test_dowel_connect_many():
+    # two 18mm planks touching in X plane, 400mm common edge along Y
+    plank = ts.WPart(Part.makeBox(thickness, 400, 100), 2, 'plank')
+    a = ts.PlacedPart(plank, [0, 0, 0], name='a')
+    b = ts.PlacedPart(plank, [thickness, 0, 0], name='b')
+    c = ts.PlacedPart(plank, [2 * thickness, 0, 0], name='c')
+    ts.dowel_connect_many([
+        ts.DowelJoint(a, b, dowel_dir=0, edge_dir=1),
+        ts.DowelJoint(b, c, dowel_dir=0, edge_dir=1, left_extent=14),
+    ])
+    # (400 - 2*20) / 80 -> 4 dowels per joint
+    assert len(a.machine_ops) == 4
+    assert len(b.machine_ops) == 8
+    assert len(c.machine_ops) == 4
+    ys = [op.start[1] for op in a.machine_ops]
+    assert ys == pytest.approx([20, 140, 260, 380])
+    for op in a.machine_ops:
+        assert op.start[0] == pytest.approx(thickness)
+        assert op.start[2] == pytest.approx(50)
+        assert op.direction[0] == pytest.approx(-1)
+        assert op.length == pytest.approx(35 / 2 + 0.5)
+    # local coordinates of part c, drill of the second joint
+    assert c.machine_ops[0].start[0] == pytest.approx(0)
+    assert c.machine_ops[0].length == pytest.approx(35 - 14 + 0.5)
+
+
+def test_dowel_connect_near_miss():
+    plank = ts.WPart(Part.makeBox(thickness, 400, 100), 3, 'plank')
+    a = ts.PlacedPart(plank, [0, 0, 0], name='a')
+    b = ts.PlacedPart(plank, [thickness + 1e-9, 0, 0], name='b')
+    c = ts.PlacedPart(plank, [2 * thickness + 0.3, 0, 0], name='c')
+    ts.dowel_connect_many([ts.DowelJoint(a, b, dowel_dir=0, edge_dir=1)])
+    assert len(b.machine_ops) == 4
+    with pytest.raises(ts.snap.ContactError, match="near miss"):
+        ts.dowel_connect_many([ts.DowelJoint(b, c, dowel_dir=0, edge_dir=1)])
+    assert len(c.machine_ops) == 0
+
+
+def test_apply_machine_ops_cuts():
+    plank = ts.WPart(Part.makeBox(18, 400, 100), 1, 'plank')
+    placed = ts.PlacedPart(plank, [100, 0, 0], name='plank')
+    placed.apply_op(ts.DrillOp(4, 10, start=[100, 50, 50], direction=[1, 0, 0]))
+    shape, cuts = placed.apply_machine_ops()
+    assert cuts == []
+    shape_c, cuts = placed.apply_machine_ops(cuts=True)
+    assert len(cuts) == 1
+    assert shape_c.Volume == pytest.approx(shape.Volume)
+    # placed tool in global coordinates
+    assert cuts[0].BoundBox.XMin == pytest.approx(100)
+
+
+def test_drill_scene():
+    doc = FreeCAD.newDocument()
+    box = Part.makeBox(100, 100, 18)
+    f_single = ts.add_object(doc, 'single', box, [10, 20, 30])
+    f_scene = ts.add_object(doc, 'scene', box, [10, 20, 30])
+    tool = Part.makeCylinder(3, 10)
+    positions = [[20 + 10 * i, 50, 30] for i in range(5)]
+    for pos in positions:
+        ts.drill(f_single, tool, pos)
+    with ts.DrillScene() as scene:
+        for pos in positions:
+            assert scene.drill(f_scene, tool, pos) is f_scene
+        # cut postponed
+        assert f_scene.Shape.Volume == pytest.approx(box.Volume)
+    assert f_scene.Shape.Volume == pytest.approx(f_single.Shape.Volume)
+    assert f_scene.Shape.Volume == pytest.approx(box.Volume - 5 * tool.Volume)
+    assert f_scene.Placement.isSame(f_single.Placement, 1e-9)
@@ -0,0 +1,60 @@
+import attrs
+import pytest
+
+import Part
+import snap
+import tool_shapes as ts
+from machine import DrillOp
+import validate
+
+
+@attrs.define
+class FakeWardrobe:
+    placed_objects: list
+    grid: snap.Grid = snap.Grid()
+    problems: list = attrs.Factory(list)
+
+
+def plank(n, name="plank"):
+    return ts.WPart.construct(name, None, 400, 100, None, n, thick=18)
+
+
+def test_preflight():
+    pannel = plank(1, "pannel")
+    a = ts.PlacedPart(pannel, [0, 0, 0], name="a")
+    b = ts.PlacedPart(pannel, [400, 0, 0], name="b")
+    ts.dowel_connect(a, b, dowel_dir=0, edge_dir=1)
+    # drill out of the part and too long drill
+    a.machine_ops.append(DrillOp(3, 10, start=[500, 0, 0]))
+    a.machine_ops.append(DrillOp(3, 30, start=[100, 50, 0]))
+    problems = validate.preflight(FakeWardrobe([a, b]))
+    messages = [str(p) for p in problems if p.severity == validate.ERROR]
+    assert len(messages) == 3
+    assert "2 instances placed" in messages[0]
+    assert "out of part bounds" in messages[1]
+    assert "longer then the part" in messages[2]
+
+
+def test_joint_coverage():
+    a = ts.PlacedPart(plank(2), [0, 0, 0], name="a")
+    b = ts.PlacedPart(a.part, [0, 0, 18], name="b")
+    problems = validate.joint_coverage([a, b], snap.Grid())
+    assert len(problems) == 1
+    assert "no joint" in problems[0].message
+
+
+def test_depth_checks():
+    a = ts.PlacedPart(plank(1), [0, 0, 0], name="a")
+    a.machine_ops.extend([
+        DrillOp(3, 12, start=[100, 50, 0]),                         # blind, 6 mm wall
+        DrillOp(3, 18, start=[120, 50, 0]),                         # through
+        DrillOp(4, 20, start=[0, 50, 9], direction=[1, 0, 0]),      # edge hole
+        DrillOp(3, 17, start=[150, 50, 0]),                         # thin wall
+        DrillOp(3, 12, start=[200, 50, 18], direction=[0, 0, -1]),  # blind from the top
+        DrillOp(3, 12, start=[250, 50, 9]),                         # starts inside, breaks through
+    ])
+    problems = validate.depth_checks(a, snap.Grid())
+    assert [(p.severity, p.message.split(":")[0]) for p in problems] == [
+        (validate.ERROR, "breakthrough 3.00 mm"),
+        (validate.WARNING, "wall 1.00 mm below the op"),
+    ]
@@ -0,0 +1,94 @@
+"""
+Parallel precomputation of the canonical tool solids.
+
+All distinct tool keys of the placed parts are collected before the cut stage and the solids are built
+in a process pool. Workers pass the shapes back as BREP strings. The cut stage takes them through
+the tool provider `ToolPrecompute.get` passed to `machine.canonical_tool` and waits only for the tool
+it needs right now, so the tool construction (lofted mill tools namely) overlaps with the cutting.
+The provider is passed explicitly, concurrent builds do not see each other's pools.
+
+Usage:
+    with ToolPrecompute.start(wardrobe.placed_objects) as pool:
+        build_from_placed(doc, wardrobe.placed_objects, tools=pool.get)
+"""
+from typing import *
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future
+from pathlib import Path
+
+import Part
+import build_log
+import machine
+import tool_shapes as ts
+
+log = build_log.get_logger(__name__)
+
+
+def collect_tool_keys(placed_parts: Iterable[ts.PlacedPart]) -> List[Tuple]:
+    """
+    Distinct tool keys in order of the first use by the cut stage.
+    Operations without canonical tool (path mills, pockets) and tools already built
+    in this process (`machine.canonical_tool` cache) are skipped.
+    """
+    keys = {op.tool_key: None for p in placed_parts for op in p.machine_ops}
+    keys.pop(None, None)
+    return [key for key in keys if not machine.tool_cached(key)]
+
+
+def tool_brep(key: Tuple) -> str:
+    """
+    Worker: build the tool solid and serialize it.
+    """
+    return machine.build_tool(key).exportBrepToString()
+
+
+def shape_from_brep(brep: str) -> Part.Shape:
+    shape = Part.Shape()
+    shape.importBrepFromString(brep)
+    return shape
+
+
+def key_file_name(key: Tuple) -> str:
+    return "_".join(str(k) for k in key) + ".brep"
+
+
+class ToolPrecompute:
+    """
+    Tool solids being built in a process pool, `get` is the `machine.canonical_tool` provider.
+    The pool is shut down at the end of the 'with' block.
+    """
+    def __init__(self, keys: List[Tuple], processes: int = None):
+        # spawned, the builds run other threads (service, export writer) that must not be forked
+        self.executor = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"))
+        self.futures: Dict[Tuple, Future] = {key: self.executor.submit(tool_brep, key) for key in keys}
+        build_log.event(log, "tool_precompute", tools=len(keys))
+
+    @classmethod
+    def start(cls, placed_parts: Iterable[ts.PlacedPart], processes: int = None) -> 'ToolPrecompute':
+        return cls(collect_tool_keys(placed_parts), processes)
+
+    def brep(self, key: Tuple) -> Optional[str]:
+        future = self.futures.get(key)
+        return None if future is None else future.result()
+
+    def get(self, key: Tuple) -> Optional[Part.Shape]:
+        """
+        Tool solid of the 'key', waits for its worker. None for keys not submitted.
+        """
+        brep = self.brep(key)
+        return None if brep is None else shape_from_brep(brep)
+
+    def save(self, directory: Path):
+        """
+        Write all tools as BREP files, one per key.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for key in self.futures:
+            (directory / key_file_name(key)).write_text(self.brep(key))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.executor.shutdown(wait=exc_type is None, cancel_futures=exc_type is not None)
@@ -2,16 +2,20 @@ from typing import *
 import sys
 import attrs
 import numpy as np
-from functools import cached_property
+from functools import cached_property, lru_cache
 
+import build_log
 import freecad
+import snap
 
 import FreeCAD
 import Part
-from machine import (DrillOp, MillOp, NoneOp, OperationList,
-                     rotate, translate, Transform,
+from machine import (DrillOp, MillOp, NoneOp, OperationList, OpTable,
+                     rotate, translate, Transform, ToolProvider, placed_tool, transform_matrix,
                      make_cylinder, make_box, fuse, fvec, vec_list)
 
+log = build_log.get_logger(__name__)
+
 #Vector = np.ndarray
 
 def add_object(doc, name, shape, translate, rotate = None):
@@ -30,15 +34,25 @@ def aabb(bb:FreeCAD.BoundBox):
     return np.array( [(bb.XMin, bb.YMin, bb.ZMin), (bb.XMax, bb.YMax, bb.ZMax)] )
 
 
+def box_corners(box: np.ndarray) -> np.ndarray:
+    """
+    :param box: (2, 3) AABB, [min, max]
+    :return: (8, 4) homogeneous corners
+    """
+    idx = np.array(np.meshgrid([0, 1], [0, 1], [0, 1], indexing='ij')).reshape(3, -1).T
+    corners = box[idx, np.arange(3)]
+    return np.concatenate([corners, np.ones((8, 1))], axis=1)
+
 
 
 
 
-def drill(feature: Part.Feature, tool:'Shape', position:Union[FreeCAD.Placement, List[float]] = None, rotation=None):
-    # Create a copy of the tool and apply possition then cut it from part in actual placement.
-    #
-    # Set the position and rotation of the tool
-    print("    drill(...", end=None)
+
+def local_tool(feature: Part.Feature, tool: 'Shape', position: Union[FreeCAD.Placement, List[float]] = None,
+               rotation=None) -> 'Shape':
+    """
+    Tool at 'position' (global coordinates) moved to the local coordinates of the feature.
+    """
     if position is None:
         position = [0, 0, 0]
     if isinstance(position, FreeCAD.Placement):
@@ -48,21 +62,67 @@ def drill(feature: Part.Feature, tool:'Shape', position:Union[FreeCAD.Placement,
             rotation = FreeCAD.Rotation()  # No rotation by default
         assert len(position) == 3
         tool_placement = FreeCAD.Placement(FreeCAD.Vector(position), rotation)
-    tool_shape = tool.copy().transformGeometry(tool_placement.toMatrix())
+    return tool @ Transform(tool_placement) @ Transform(feature.Placement.inverse())
+
+
+def cut_feature(feature: Part.Feature, tools: List['Shape']):
+    """
+    Cut all tools (feature local coordinates) from the feature shape by a single boolean,
+    feature placement is kept.
+    """
     f_placement = feature.Placement
-    part_shape = feature.Shape.copy().transformGeometry(f_placement.toMatrix())
+    part_shape = feature.Shape
     part_shape.Placement = FreeCAD.Placement()
-    # Perform the cut operation
-    result_shape = part_shape.cut(tool_shape)
-    inverse_placement = f_placement.inverse()
-    inv_mat = inverse_placement.toMatrix()
-    res_shape_back = result_shape.transformGeometry(inv_mat)
-    feature.Shape = res_shape_back
+    feature.Shape = part_shape.cut(tools) if len(tools) > 1 else part_shape.cut(tools[0])
     feature.Placement = f_placement
-    print(")")
+
+
+def drill(feature: Part.Feature, tool:'Shape', position:Union[FreeCAD.Placement, List[float]] = None, rotation=None):
+    # Move the tool to the local coordinates of the feature and cut it from the feature shape,
+    # feature placement is kept.
+    # Use DrillScene for more tools.
+    log.debug("drill %s", feature.Name)
+    cut_feature(feature, [local_tool(feature, tool, position, rotation)])
     return feature
 
 
+class DrillScene:
+    """
+    Collects the tools of the features, every feature is cut just once by all its tools
+    when the scene is finalized. Tools are moved to the feature local coordinates immediately,
+    so the feature placement must not change until `finalize`.
+    Usage:
+        with DrillScene() as scene:
+            pannel_f = scene.drill(pannel_f, tool, position)
+            shelf_f = scene.drill(shelf_f, tool, position)
+    """
+    def __init__(self):
+        # id(feature) -> (feature, tools)
+        self._pending: Dict[int, Tuple[Part.Feature, List['Shape']]] = {}
+
+    def drill(self, feature: Part.Feature, tool: 'Shape', position: Union[FreeCAD.Placement, List[float]] = None,
+              rotation=None) -> Part.Feature:
+        """
+        Same arguments as `drill`, the cut is postponed.
+        """
+        _, tools = self._pending.setdefault(id(feature), (feature, []))
+        tools.append(local_tool(feature, tool, position, rotation))
+        return feature
+
+    def finalize(self):
+        for feature, tools in self._pending.values():
+            log.debug("drill %s, %d tools", feature.Name, len(tools))
+            cut_feature(feature, tools)
+        self._pending.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.finalize()
+
+
 def pin():
     # pin real dimensions
     pin_in_diam = 5.0
@@ -97,7 +157,7 @@ def pin():
 
 
 
-def pin_edge(shelf_width):
+def pin_edge(shelf_width, z_step=40, dist_from_front=40):
     """
     All pin drills associated with shelf edge.
     Assume shelf bottom edge passing through origin.
@@ -105,12 +165,12 @@ def pin_edge(shelf_width):
     X - shelf length
     Y - shelf depth/width
     Z - shelf thickness
+    :param z_step: vertical distance of the pin rows
+    :param dist_from_front: pins from the front and from the back edge
     :return:
     """
     pannel_pin, shelf_pin = pin()
     # Assume panel and shelf are objects with Placement
-    z_step = 40
-    dist_from_front = 40
     y_shift = shelf_width / 2 - dist_from_front
     pins = lambda x_pin: [
         (x_pin.copy()) @ (translate([0, y, z]))
@@ -168,7 +228,7 @@ def dowel_row(a, b, n, dowel_vec, edge_vec, left_extent=0):
     return row
 
 
-def rastex(shelf_thickness, through:bool=False):
+def rastex(shelf_thickness, through:bool=False, hetix_x=None):
     """
     Drilling tool for rastex fitting for the whole shelf edga
     Composed of:
@@ -182,21 +242,23 @@ def rastex(shelf_thickness, through:bool=False):
     :param self:
     :param shelf_thickness:
     :param through:
+    :param hetix_x: distance of the hetix axis from the shelf edge, None for the default of the variant
     :return:
     """
     hetix_diam = 15.5
     hetix_l = 13.5
-    # hetix_x = 34
     if through:
         pin_in_diam = 8.5
         pin_in_l = shelf_thickness
-        hetix_x = 24.5  # assume shorter double ended dowel and 0.5 correction for 18mm pannel
+        default_x = 24.5  # assume shorter double ended dowel and 0.5 correction for 18mm pannel
         # asume usage without side spring
     else:
         # M6 fitting
         pin_in_diam = 8
         pin_in_l = 11.5
-        hetix_x = 34
+        default_x = 34
+    if hetix_x is None:
+        hetix_x = default_x
     # shlef connection
     pin_out_diam = 8.5
     pin_out_l = hetix_x
@@ -216,7 +278,7 @@ def rastex(shelf_thickness, through:bool=False):
 
 
 
-def vb(shelf_thickness, through=False):
+def vb(shelf_thickness, through=False, pin_z_shift=8):
     """
     Drilling tool for rastex fitting for the whole shelf edga
     Composed of:
@@ -230,6 +292,7 @@ def vb(shelf_thickness, through=False):
     :param self:
     :param shelf_thickness:
     :param through:
+    :param pin_z_shift: pin axis above the shelf bottom face
     :return:
     """
     vb_diam_large = 20
@@ -242,8 +305,6 @@ def vb(shelf_thickness, through=False):
     # M6 fitting
     pin_in_diam = 8
     pin_in_l = 11.5
-    # center of fitting should be at the center of the shelf
-    pin_z_shift = 8
 
     # Create the hetix cylinder (vertical along Z-axis)
     # large = Part.makeCylinder(vb_diam_large / 2, vb_l_large) @ translate([vb_large_x, 0, 0])
@@ -263,16 +324,21 @@ def vb(shelf_thickness, through=False):
 
 
 
-def strong_edge(thickness, shelf_width, tool, through:bool=False):
-    thickness = 18
-    dowel_to_pannel = 14
-    rastex_pair = tool(thickness, through)
+def strong_edge(thickness, shelf_width, tool, through:bool=False,
+                dowel_to_pannel=14, dist_from_front=40, dowel_y=(-120, 20, 160), **tool_params):
+    """
+    Fittings at both ends of the shelf edge and the dowels between them.
+    :param tool: fitting tool function, `rastex` or `vb`, called as tool(thickness, through, **tool_params)
+    :param dowel_to_pannel: dowel length in the pannel
+    :param dist_from_front: fittings from the front and from the back edge
+    :param dowel_y: dowel positions relative to the shelf width center
+    """
+    rastex_pair = tool(thickness, through, **tool_params)
     dowel_pair = dowel(left_extent=dowel_to_pannel) @ translate([0, 0, thickness/2.0])
-    dist_from_front = 40
     y_shift = shelf_width / 2 - dist_from_front  # 260
-    parts = [rastex_pair, dowel_pair, dowel_pair, dowel_pair, rastex_pair]
+    parts = [rastex_pair, *[dowel_pair for y in dowel_y], rastex_pair]
     pannel_parts, shelf_parts = zip(*parts)
-    yy = [-y_shift, -120, 20, 160, y_shift]
+    yy = [-y_shift, *dowel_y, y_shift]
     place = lambda parts : OperationList(*[
         p @ translate([0, y, 0])
         for p, y in zip(parts, yy)])
@@ -286,21 +352,21 @@ def side_symmetric(shape: DrillOp):
     l_side = shape @ (rotate([0, 0, 1], 180))
     return (l_side, r_side)
 
-def rail():
+def rail(z_shift=47, x_depth=12, shelf_width=600, y_shift=2):
     """
     In order to support rails at both sides of the pannel
     at same height we have distinct drill patterns for the left and the right
     side of the pannel. The two side drilling function has to support
     tools as pairs and decide for the left or right according to the side.
+    :param z_shift: axis of rail from bottom face of the box
+    :param x_depth: depth of the rail screw holes
+    :param shelf_width: length of the rail mill
+    :param y_shift: rails 2mm from the front
     :return:
 
     Pojez 1-2mm dovnitř, dopředu více, celkem cca 4
     """
     # holes relative to rail front and axis
-    z_shift = 47    # axis of rail from bottom face of the box
-    x_depth = 12
-    shelf_width = 600
-    y_shift = 2     # rails 2mm from the front
 
     holes_l = [
         (6, 35, 0),
@@ -349,23 +415,40 @@ def drawer(width, height, depth):
     return fuse(components)
 
 
-@attrs.define
+def quaternion(rot: Union[FreeCAD.Rotation, Sequence[float]]) -> Tuple[float, float, float, float]:
+    if isinstance(rot, FreeCAD.Rotation):
+        rot = rot.Q
+    return tuple(float(q) for q in rot)
+
+
+@attrs.define(frozen=True)
 class PlankPart:
     length : float
     width : float
-    rot : FreeCAD.Rotation   # rotation object
+    rot : Tuple[float, float, float, float] = attrs.field(converter=quaternion)   # rotation quaternion
     thick : float
 
+    @property
+    def rotation(self) -> FreeCAD.Rotation:
+        return FreeCAD.Rotation(*self.rot)
+
     def shape(self):
         shape = Part.makeBox(self.length, self.width, self.thick)
-        rot_mat = FreeCAD.Placement(FreeCAD.Vector(0,0,0), self.rot).toMatrix()
-        shape = shape.transformGeometry(rot_mat)
+        shape = shape @ Transform(FreeCAD.Placement(FreeCAD.Vector(0,0,0), self.rotation))
         bb = shape.BoundBox
         return shape @ translate([-bb.XMin, -bb.YMin, -bb.ZMin])
 
 
 
 
+@lru_cache(maxsize=None)
+def plank_shape(plank: PlankPart) -> Part.Shape:
+    """
+    Shape shared by all parts with equal plank dimensions.
+    """
+    return plank.shape()
+
+
 @attrs.define
 class WPart:
     shape: Part.Shape
@@ -395,17 +478,29 @@ class WPart:
                 rot_total = rot.multiply(rot_total)
                # print(rot_ax, rot, rot_total)
         plank = PlankPart(length, width, rot_total, thick)
-        part_shape = plank.shape()
-        return cls(part_shape, n_parts, name, dimensions=plank)
+        return cls(plank_shape(plank), n_parts, name, dimensions=plank)
 
+    @cached_property
+    def box(self) -> np.ndarray:
+        """
+        AABB of the shape in the part coordinates.
+        """
+        return aabb(self.shape.BoundBox)
 
-    def allocate(self):
+
+    def allocate(self, strict: bool = True):
         """
         Allocate new part instance, numbered from 1 in order
+        :param strict: False to allow more instances then 'n_parts', left for validation
         :return:
         """
         self._i_part += 1
-        assert self._i_part <= self.n_parts, f"Out of part: {self.name}, #{self._i_part} > {self.n_parts}"
+        if strict:
+            assert self._i_part <= self.n_parts, f"Out of part: {self.name}, #{self._i_part} > {self.n_parts}"
+        return self._i_part
+
+    @property
+    def n_allocated(self):
         return self._i_part
 
 
@@ -426,21 +521,38 @@ class PlacedPart:
     obj: 'Part.Feature' = None     # set after init
     name : str = ""
     machine_ops: List[Any] = attrs.Factory(list)
+    # rotation quaternion, applied before the translation by 'position'
+    rotation: Tuple[float, float, float, float] = attrs.field(default=(0.0, 0.0, 0.0, 1.0), converter=quaternion)
 
-    @cached_property
+    @property
     def placement(self) -> Transform:
+        """
+        Placement of the part shape, the shape itself may carry own Placement
+        (location from the rigid transforms), that is applied first.
+        Built from 'position' and 'rotation', the instance keeps no derived state.
+        """
         pos = fvec(self.position)
-        new_placement = FreeCAD.Placement(pos, FreeCAD.Rotation())
-        return Transform(new_placement * self.part.shape.Placement)
+        return Transform(FreeCAD.Placement(pos, FreeCAD.Rotation(*self.rotation)))
 
-    @cached_property
-    def aabb(self):
-        final_shape = self.part.shape @ self.placement
-        return aabb(final_shape.BoundBox)
+    @property
+    def aabb(self) -> np.ndarray:
+        """
+        World AABB, the placed corners of the part box (exact for the axis aligned parts).
+        """
+        corners = box_corners(self.part.box) @ transform_matrix(self.placement).T
+        return np.array([np.min(corners[:, :3], axis=0), np.max(corners[:, :3], axis=0)])
 
     def max(self, ax):
         return self.aabb[1][ax]
 
+    def set_world(self, placement: Transform):
+        """
+        Set placement computed outside (see `scene.SceneGraph`), no geometry involved.
+        Machine operations are in local coordinates, so they move with the part.
+        """
+        self.position = vec_list(placement.placement.Base)
+        self.rotation = placement.placement.Rotation
+
     def apply_op(self, drill_op):
         """
         Add machine operation to the list of operations
@@ -451,9 +563,24 @@ class PlacedPart:
         drill_ops = (drill_op @ inv_placement).expand()
         self.machine_ops.extend(drill_ops)
 
-    def apply_machine_ops(self):
+    def apply_table(self, table: OpTable):
+        """
+        Add all operations of the table given in global coordinates.
+        :param table:
+        :return:
+        """
+        local_table = table @ self.placement.inverse()
+        self.machine_ops.extend(local_table.to_ops())
+
+    def apply_machine_ops(self, cuts: bool = False, tools: ToolProvider = None):
+        """
+        Cut all machine operations from the part shape.
+        :param cuts: collect the placed tool shapes for the visualization
+        :param tools: source of the canonical tool solids of the build, see `machine.canonical_tool`
+        :return: machined shape in the part coordinates, list of the placed tools (empty if not 'cuts')
+        """
         shape = self.part.shape
-        cuts = []
+        placed_cuts = []
         for op in self.machine_ops:
             # # Create a cylinder for the hole (drill) with the given radius and length
             # cylinder = Part.makeCylinder(op.radius, op.length)
@@ -467,22 +594,29 @@ class PlacedPart:
             # # Apply the placement (translation + rotation) to the cylinder
             # cylinder.Placement = FreeCAD.Placement(op.start, rotation)
             #
-            print("   apply ", repr(op))
-            tool = op.tool_shape
-            placed_cut = tool.copy() @ self.placement
-            cuts.append(placed_cut)
+            log.debug("%s apply %r", self.name, op)
+            tool = placed_tool(op, tools)
+            if cuts:
+                placed_cuts.append(tool @ self.placement)
             # Subtract the cylinder from the original shape to simulate drilling
             shape = shape.cut(tool)
 
-        return shape, cuts
+        return shape, placed_cuts
 
 
-    def make_obj(self, doc):
+    def make_obj(self, doc, cuts: bool = False, tools: ToolProvider = None):
+        shape, cuts = self.apply_machine_ops(cuts, tools)
+        return self.add_obj(doc, shape), cuts
+
+    def add_obj(self, doc, shape: Part.Shape):
+        """
+        Document object of the already machined 'shape' (part coordinates) at the part placement.
+        """
         obj = doc.addObject("Part::Feature", self.name)
-        shape, cuts = self.apply_machine_ops()
         obj.Shape = shape
-        obj.Placement = self.placement.placement
-        return obj, cuts
+        # feature Placement replaces the shape location, compose them
+        obj.Placement = self.placement.placement.multiply(shape.Placement)
+        return obj
 
 def interval_intersect(bb_a, bb_b, rel_range = None):
     i_min, i_max = 0, 1
@@ -493,8 +627,169 @@ def interval_intersect(bb_a, bb_b, rel_range = None):
     return (1 - rel_a) * a + rel_a * b, (1 - rel_b) * a + rel_b * b
 
 
+@attrs.define
+class DowelJoint:
+    """
+    Arguments of a single `dowel_connect` call, see there.
+    """
+    part_a: PlacedPart
+    part_b: PlacedPart
+    dowel_dir: int
+    edge_dir: int
+    other_pos: float = None
+    rel_range: Tuple = (None, None, None)
+    left_extent: float = 0
+
+
+def dowel_positions(bb_a, bb_b, dowel_dir, edge_dir, rel_range, other_pos):
+    """
+    Vectorized computation of the dowel rows for N part pairs, see `dowel_connect`.
+    :param bb_a: (N, 2, 3) AABBs of the parts A
+    :param bb_b: (N, 2, 3) AABBs of the parts B
+    :param dowel_dir: (N,) axis of dowels
+    :param edge_dir: (N,) axis of the dowel row
+    :param rel_range: (N, 3, 2) relative sub range of the connecting surface, (0, 1) for full extent
+    :param other_pos: (N,) absolute position along the remaining axis, NaN for the center
+    :return: (joint index (M,), dowel centers (M, 3)), M is the total number of dowels
+    """
+    i_min, i_max = 0, 1
+    n = len(bb_a)
+    idx = np.arange(n)
+    remain_dir = 3 - dowel_dir - edge_dir
+    connect_plane_a = bb_a[idx, i_max, dowel_dir]
+    connect_plane_b = bb_b[idx, i_min, dowel_dir]
+    mismatch = connect_plane_a != connect_plane_b
+    assert not np.any(mismatch), \
+        f"{connect_plane_a[mismatch]} != {connect_plane_b[mismatch]}"
+
+    # interval_intersect for all axes at once
+    lo = np.maximum(bb_a[:, i_min, :], bb_b[:, i_min, :])
+    hi = np.minimum(bb_a[:, i_max, :], bb_b[:, i_max, :])
+    rel_a, rel_b = rel_range[..., 0], rel_range[..., 1]
+    iv_min = (1 - rel_a) * lo + rel_a * hi
+    iv_max = (1 - rel_b) * lo + rel_b * hi
+
+    edge_min = iv_min[idx, edge_dir] + 20
+    edge_max = iv_max[idx, edge_dir] - 20
+    valid = edge_max >= edge_min
+    dowel_dist = 80
+    n_dowels = np.floor((edge_max - edge_min) / dowel_dist).astype(int)
+    # 2 dowels case
+    few = n_dowels < 3
+    edge_min = np.where(few, edge_min - 10, edge_min)
+    edge_max = np.where(few, edge_max + 10, edge_max)
+    dist = edge_max - edge_min
+    valid &= ~(few & (dist < 1.0))
+    n_dowels = np.where(few, np.where(dist > 20, 2, 1), n_dowels)
+
+    other_min, other_max = iv_min[idx, remain_dir], iv_max[idx, remain_dir]
+    has_pos = ~np.isnan(other_pos)
+    # zero connecting surface
+    valid &= has_pos | ((other_max - other_min) >= 16)
+    remain_pos = np.where(has_pos, other_pos, (other_min + other_max) / 2.0)
+    n_dowels = np.where(valid, n_dowels, 0)
+
+    # np.linspace(edge_min, edge_max, n_dowels) for every joint
+    joint = np.repeat(idx, n_dowels)
+    first = np.cumsum(n_dowels) - n_dowels
+    k = np.arange(len(joint)) - first[joint]
+    n_j = n_dowels[joint]
+    step = (edge_max - edge_min)[joint] / np.maximum(n_j - 1, 1)
+    edge_pos = np.where((k == n_j - 1) & (n_j > 1), edge_max[joint], edge_min[joint] + k * step)
+
+    m = np.arange(len(joint))
+    centers = np.zeros((len(joint), 3))
+    centers[m, dowel_dir[joint]] = connect_plane_a[joint]
+    centers[m, edge_dir[joint]] = edge_pos
+    centers[m, remain_dir[joint]] = remain_pos[joint]
+    return joint, centers
+
+
+def snapped_contacts(joints: List[DowelJoint], grid: snap.Grid = None):
+    """
+    Snap AABBs of the joint parts to the grid and check that every pair
+    touches in its 'dowel_dir' plane.
+    :param joints:
+    :param grid: default `snap.DEFAULT_GRID`
+    :return: (bb_a, bb_b, touch, problems); snapped (N, 2, 3) AABBs with the touching planes made
+        exactly equal, (N,) bool mask of touching joints, list of messages for the joints out of contact.
+    """
+    if grid is None:
+        grid = snap.DEFAULT_GRID
+    idx = np.arange(len(joints))
+    dowel_dir = np.array([j.dowel_dir for j in joints], dtype=int)
+    bb_a = np.array([j.part_a.aabb for j in joints]).reshape(-1, 2, 3)
+    bb_b = np.array([j.part_b.aabb for j in joints]).reshape(-1, 2, 3)
+    plane_a = bb_a[idx, 1, dowel_dir]
+    plane_b = bb_b[idx, 0, dowel_dir]
+    touch = grid.equal(plane_a, plane_b)
+    near = grid.near_miss(plane_a, plane_b)
+    problems = [
+        f"{joints[i].part_a.name} / {joints[i].part_b.name}: "
+        f"{'near miss' if near[i] else 'no contact'} in axis {dowel_dir[i]}, "
+        f"gap {plane_b[i] - plane_a[i]:.4f} mm"
+        for i in np.flatnonzero(~touch)]
+    bb_a, bb_b = grid.snap(bb_a), grid.snap(bb_b)
+    bb_b[idx, 0, dowel_dir] = bb_a[idx, 1, dowel_dir]
+    return bb_a, bb_b, touch, problems
+
+
+def dowel_connect_many(joints: List[DowelJoint], grid: snap.Grid = None, strict: bool = True):
+    """
+    Place connecting dowel rows for many part pairs in a single vectorized pass.
+    Equivalent to `dowel_connect` called for every joint. Operations are
+    added to every part at once in the order of the joints.
+    Part coordinates are snapped to the 'grid', all joints out of contact
+    are reported by single `snap.ContactError` before any operation is added.
+    :param joints:
+    :param grid: default `snap.DEFAULT_GRID`
+    :param strict: False to skip the joints out of contact instead of raising
+    :return: list of problems of the skipped joints
+    """
+    if not joints:
+        return []
+    full_range = (0.0, 1.0)
+    bb_a, bb_b, touch, problems = snapped_contacts(joints, grid)
+    if problems:
+        if strict:
+            raise snap.ContactError("Dowel joints out of contact:\n    " + "\n    ".join(problems))
+        joints = [j for j, t in zip(joints, touch) if t]
+        bb_a, bb_b = bb_a[touch], bb_b[touch]
+    dowel_dir = np.array([j.dowel_dir for j in joints])
+    edge_dir = np.array([j.edge_dir for j in joints])
+    rel_range = np.array([[full_range if r is None else r for r in j.rel_range] for j in joints], dtype=float)
+    other_pos = np.array([np.nan if j.other_pos is None else j.other_pos for j in joints], dtype=float)
+    joint, centers = dowel_positions(bb_a, bb_b, dowel_dir, edge_dir, rel_range, other_pos)
+
+    # dowel extents, see `dowel`
+    diam = 6
+    l = 35
+    left_extent = np.array([j.left_extent for j in joints], dtype=float)
+    left = np.where(left_extent == 0, l / 2, np.where(left_extent > 0, left_extent, l + left_extent))
+    right = l - left
+    dowel_vec = np.eye(3)[dowel_dir[joint]]
+
+    # rows interleaved: (left drill to part A, right drill to part B) for every dowel
+    n = len(joint)
+    table = OpTable.drills(
+        diam / 2,
+        np.stack([left[joint], right[joint]], axis=1).reshape(-1) + 0.5,
+        np.repeat(centers, 2, axis=0),
+        np.stack([-dowel_vec, dowel_vec], axis=1).reshape(-1, 3))
+    parts = {}
+    owner = np.empty(2 * n, dtype=int)
+    for side, attr in enumerate(['part_a', 'part_b']):
+        part_ids = [parts.setdefault(id(getattr(j, attr)), (len(parts), getattr(j, attr)))[0] for j in joints]
+        owner[side::2] = np.array(part_ids, dtype=int)[joint]
+    for i_part, part in parts.values():
+        rows = np.flatnonzero(owner == i_part)
+        if len(rows):
+            part.apply_table(table[rows])
+    return problems
+
+
 def dowel_connect(part_a:PlacedPart, part_b:PlacedPart, dowel_dir, edge_dir,
-                  other_pos=None, rel_range=(None, None, None), left_extent = 0):
+                  other_pos=None, rel_range=(None, None, None), left_extent = 0, grid=None):
     """
     Place row of connecting dowels for two rectangular, axes aligned parts.
     The connecting surface is automatically detected from 'dowel_dir',
@@ -505,65 +800,15 @@ def dowel_connect(part_a:PlacedPart, part_b:PlacedPart, dowel_dir, edge_dir,
     Relative edge edtend or other dir position could be limited by rel_range.
     Rel range is tuple of three items one for each axis, each could be None (full extend)
     or pair of numbers in interval (0, 1.0) denoting sub range of connecting surface.
+    Use `dowel_connect_many` for many joints.
     :param dowel_dir: 0| 1 | 2; axis of dowels
     :param edge_dir: 0| 1 | 2; axis of the dowel row
     :param other_pos:
     :return:
     """
-    # return part_a, part_b   # Temporarly disable all dowels
-    i_min, i_max = 0, 1
-    bb_a = part_a.aabb
-    bb_b = part_b.aabb
-    connect_plane_a = bb_a[i_max, dowel_dir]
-    connect_plane_b = bb_b[i_min, dowel_dir]
-    assert connect_plane_a == connect_plane_b, f"{connect_plane_a} != {connect_plane_b}"
-    edge_min, edge_max = interval_intersect(bb_a[:, edge_dir], bb_b[:, edge_dir], rel_range[edge_dir])
-    edge_min, edge_max = edge_min + 20, edge_max -20
-    if edge_max < edge_min:
-        return part_a, part_b
-    dowel_dist = 80
-    n_dowels = int((edge_max - edge_min) / dowel_dist)
-    if n_dowels < 3:
-        # 2 dowels case
-        edge_min -= 10
-        edge_max += 10
-        # compute remaining dist
-        dowel_dist = edge_max - edge_min
-        if edge_max - edge_min < 1.0:
-            return part_a, part_b
-        if dowel_dist > 20:
-            n_dowels = 2
-        elif dowel_dist > 0:
-            n_dowels = 1
-        else:
-            # n_dowels == 0
-            return part_a, part_b
-
-    dowel_vec = [0, 0, 0]
-    dowel_vec[dowel_dir] = 1.0
-    edge_vec = [0, 0, 0]
-    edge_vec[edge_dir] = 1.0
-    dowel_ops = dowel_row(edge_min, edge_max, n_dowels, dowel_vec, edge_vec, left_extent=left_extent)
-    for d in dowel_ops:
-        dowel_left, dowel_right = d
-        position = [0, 0, 0]
-        position[dowel_dir] = connect_plane_a
-        position[dowel_dir] = connect_plane_a
-        remain_dir = 3 - dowel_dir - edge_dir
-        if other_pos is None:
-            other_min, other_max = interval_intersect(bb_a[:, remain_dir], bb_b[:, remain_dir], rel_range[remain_dir])
-            #assert bb_a[i_min][remain_dir] == bb_b[i_min][remain_dir]
-            #assert bb_a[i_max][remain_dir] == bb_b[i_max][remain_dir]
-            if (other_max - other_min) < 16:
-                # zero connecting surface
-                return part_a, part_b
-            remain_pos = (other_min + other_max) / 2.0
-        else:
-            remain_pos = other_pos
-        position[remain_dir] = remain_pos
-        shift = translate(position)
-        part_a.apply_op(dowel_left @ (shift))
-        part_b.apply_op(dowel_right @ (shift))
+    dowel_connect_many([DowelJoint(part_a, part_b, dowel_dir, edge_dir,
+                                   other_pos=other_pos, rel_range=rel_range, left_extent=left_extent)],
+                       grid=grid)
     return part_a, part_b
 
 def bottom_slider():
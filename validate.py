@@ -0,0 +1,216 @@
+"""
+Fast pre-flight validation of the assembled wardrobe.
+
+Works only with the analytic data: AABBs of the placed parts, bounding boxes of the part shapes
+and the machine operations in the part local coordinates. No boolean operations are performed,
+so all problems are reported at once before the expensive geometry work starts.
+
+Usage:
+    w = Wardrobe(workdir, strict=False)     # dry run, collects problems instead of raising
+    problems = validate.preflight(w)
+    if not validate.report(problems):
+        ...
+"""
+from typing import *
+import logging
+import attrs
+import numpy as np
+
+import build_log
+import snap
+import tool_shapes as ts
+from machine import OpTable, DRILL
+
+log = build_log.get_logger(__name__)
+
+ERROR = "error"
+WARNING = "warning"
+
+
+@attrs.define
+class Problem:
+    severity: str       # ERROR | WARNING
+    part: str
+    message: str
+
+    def __str__(self):
+        return f"{self.severity.upper():8}{self.part}: {self.message}"
+
+
+def part_counts(placed_parts: List[ts.PlacedPart]) -> List[Problem]:
+    """
+    Number of placed instances of every part against its 'n_parts'.
+    """
+    counts = {}
+    for p in placed_parts:
+        part, n = counts.get(id(p.part), (p.part, 0))
+        counts[id(p.part)] = (part, n + 1)
+    problems = []
+    for part, n in counts.values():
+        if n > part.n_parts:
+            problems.append(Problem(ERROR, part.name, f"{n} instances placed, only {part.n_parts} available"))
+        elif n < part.n_parts:
+            problems.append(Problem(WARNING, part.name, f"only {n} of {part.n_parts} instances used"))
+    return problems
+
+
+def max_chord(size: np.ndarray, direction: np.ndarray) -> np.ndarray:
+    """
+    Length of the longest segment in direction 'direction' (N, 3) inside a box of given 'size'.
+    """
+    direction = direction / np.linalg.norm(direction, axis=1, keepdims=True)
+    with np.errstate(divide='ignore'):
+        chord = size[None, :] / np.abs(direction)
+    return np.min(chord, axis=1)
+
+
+def op_checks(placed: ts.PlacedPart, grid: snap.Grid) -> List[Problem]:
+    """
+    Operations of single part against the bounding box of the part (local coordinates):
+    - drill must start inside or on the boundary of the box
+    - mill path (start - end segment) must overlap the box
+    - length of the operation must not exceed the part extent in the operation direction
+    """
+    if not placed.machine_ops:
+        return []
+    table = OpTable.from_ops(placed.machine_ops)
+    box = ts.aabb(placed.part.shape.BoundBox)
+    i_box = grid.index(box)
+    i_start, i_end = grid.index(table.start), grid.index(table.end)
+    # integer comparisons with single grid step tolerance
+    seg_min, seg_max = np.minimum(i_start, i_end), np.maximum(i_start, i_end)
+    outside = np.any((seg_max < i_box[0] - 1) | (seg_min > i_box[1] + 1), axis=1)
+    start_out = np.any((i_start < i_box[0] - 1) | (i_start > i_box[1] + 1), axis=1)
+    outside |= start_out & (table.kind == DRILL)
+    too_long = grid.index(table.length) > grid.index(max_chord(box[1] - box[0], table.direction)) + 1
+
+    problems = []
+    for i in np.flatnonzero(outside):
+        problems.append(Problem(ERROR, placed.name, f"op out of part bounds: {placed.machine_ops[i]}"))
+    for i in np.flatnonzero(too_long):
+        problems.append(Problem(ERROR, placed.name, f"op longer then the part: {placed.machine_ops[i]}"))
+    return problems
+
+
+def exit_distance(box: np.ndarray, start: np.ndarray, direction: np.ndarray) -> np.ndarray:
+    """
+    Ray cast from 'start' (N, 3) in 'direction' (N, 3) against the 'box' (2, 3), slab method.
+    :return: (N,) distance from the start to the box exit point, -inf for rays missing the box
+    """
+    direction = direction / np.linalg.norm(direction, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_lo = (box[0] - start) / direction
+        t_hi = (box[1] - start) / direction
+    t_near = np.minimum(t_lo, t_hi)
+    t_far = np.maximum(t_lo, t_hi)
+    # direction parallel to the slab: inside or missing the slab
+    parallel = direction == 0
+    inside = (start >= box[0]) & (start <= box[1])
+    t_near = np.where(parallel, np.where(inside, -np.inf, np.inf), t_near)
+    t_far = np.where(parallel, np.where(inside, np.inf, -np.inf), t_far)
+    t_enter, t_exit = np.max(t_near, axis=1), np.min(t_far, axis=1)
+    return np.where(t_enter <= t_exit, t_exit, -np.inf)
+
+
+def depth_checks(placed: ts.PlacedPart, grid: snap.Grid, min_wall: float = 2.0) -> List[Problem]:
+    """
+    Remaining wall thickness below the bottom of every operation (part local coordinates),
+    the ray from the op start in the op direction is cast against the part box.
+    - wall below 'min_wall': warning, the face may blow out
+    - negative wall: error, the tool breaks through the opposite face
+    - zero wall (up to a grid step): intended through hole
+    Operations starting out of the part or longer then the part are reported by `op_checks`.
+    Only plank parts are checked, their box is the true shape.
+    """
+    if not placed.machine_ops or placed.part.dimensions is None:
+        return []
+    table = OpTable.from_ops(placed.machine_ops)
+    box = ts.aabb(placed.part.shape.BoundBox)
+    i_start, i_box = grid.index(table.start), grid.index(box)
+    start_in = np.all((i_start >= i_box[0] - 1) & (i_start <= i_box[1] + 1), axis=1)
+    fits = grid.index(table.length) <= grid.index(max_chord(box[1] - box[0], table.direction)) + 1
+    # start snapped into the box, so the rays starting on the faces do not miss it
+    start = np.clip(table.start, box[0], box[1])
+    i_wall = grid.index(exit_distance(box, start, table.direction)) - grid.index(table.length)
+    check = start_in & fits
+
+    problems = []
+    for i in np.flatnonzero(check & (i_wall < -1)):
+        problems.append(Problem(ERROR, placed.name,
+                                f"breakthrough {-i_wall[i] * grid.step:.2f} mm: {placed.machine_ops[i]}"))
+    for i in np.flatnonzero(check & (i_wall > 1) & (i_wall < grid.index(min_wall))):
+        problems.append(Problem(WARNING, placed.name,
+                                f"wall {i_wall[i] * grid.step:.2f} mm below the op: {placed.machine_ops[i]}"))
+    return problems
+
+
+def joint_coverage(placed_parts: List[ts.PlacedPart], grid: snap.Grid, min_overlap=16.0) -> List[Problem]:
+    """
+    Every pair of planks in face contact should have some operation starting at the contact face.
+    Parts without plank dimensions (drawers, test boxes) are not checked.
+    :param min_overlap: minimal size of the contact rectangle in both directions [mm]
+    """
+    planks = [p for p in placed_parts if p.part.dimensions is not None]
+    if len(planks) < 2:
+        return []
+    bb = grid.index(np.array([p.aabb for p in planks]))
+    lo, hi = bb[:, 0, :], bb[:, 1, :]
+    i_overlap = grid.index(min_overlap)
+    # global start points of all operations
+    op_part, op_start = [], []
+    for i, p in enumerate(planks):
+        if p.machine_ops:
+            table = OpTable.from_ops(p.machine_ops) @ p.placement
+            op_start.append(grid.index(table.start))
+            op_part.append(np.full(len(table), i))
+    op_start = np.concatenate(op_start) if op_start else np.empty((0, 3), dtype=np.int64)
+    op_part = np.concatenate(op_part) if op_part else np.empty(0, dtype=int)
+
+    problems = []
+    for d in range(3):
+        a_ax, b_ax = [ax for ax in range(3) if ax != d]
+        touch = np.abs(hi[:, None, d] - lo[None, :, d]) <= 1
+        c_lo = np.maximum(lo[:, None, :], lo[None, :, :])
+        c_hi = np.minimum(hi[:, None, :], hi[None, :, :])
+        touch &= (c_hi[..., a_ax] - c_lo[..., a_ax] > i_overlap) & (c_hi[..., b_ax] - c_lo[..., b_ax] > i_overlap)
+        for i, j in np.argwhere(touch):
+            sel = (op_part == i) | (op_part == j)
+            pts = op_start[sel]
+            rect_lo, rect_hi = c_lo[i, j].copy(), c_hi[i, j].copy()
+            rect_lo[d] = rect_hi[d] = hi[i, d]
+            on_face = np.all((pts >= rect_lo - 1) & (pts <= rect_hi + 1), axis=1)
+            if not np.any(on_face):
+                problems.append(Problem(WARNING, planks[i].name,
+                                        f"no joint operation on the contact with {planks[j].name}, axis {d}"))
+    return problems
+
+
+def preflight(wardrobe: 'Wardrobe', grid: snap.Grid = None) -> List[Problem]:
+    """
+    Run all checks on the assembled (not machined) wardrobe.
+    :param wardrobe: preferably constructed with strict=False to collect all its construction problems
+    :param grid: default is the wardrobe grid
+    :return: list of all problems found
+    """
+    if grid is None:
+        grid = wardrobe.grid
+    problems = [Problem(ERROR, "wardrobe", msg) for msg in wardrobe.problems]
+    placed_parts = wardrobe.placed_objects
+    problems.extend(part_counts(placed_parts))
+    for p in placed_parts:
+        problems.extend(op_checks(p, grid))
+        problems.extend(depth_checks(p, grid))
+    problems.extend(joint_coverage(placed_parts, grid))
+    return problems
+
+
+def report(problems: List[Problem], elapsed: float = None) -> bool:
+    """
+    Log all problems and the 'preflight' summary event.
+    :return: True if there is no error.
+    """
+    n_errors = sum(p.severity == ERROR for p in problems)
+    for p in problems:
+        log.log(logging.ERROR if p.severity == ERROR else logging.WARNING, "%s", p)
+    build_log.event(log, "preflight", errors=n_errors, warnings=len(problems) - n_errors, elapsed=elapsed)
+    return n_errors == 0